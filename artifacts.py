@@ -0,0 +1,99 @@
+"""
+artifacts.py — Versioned on-disk cache of fitted models and embeddings
+
+Each artifact is a joblib file plus a manifest entry recording the SHA-256 of
+every source file it was built from. On startup a phase asks the store for
+its artifact; if any source changed (or the format/library versions differ)
+the store reports a miss and the phase rebuilds and saves a fresh copy.
+Callers hash the sources before building (hash_sources) and pass those
+digests to save(), so a file edited during the build is not recorded as current.
+NumPy arrays inside artifacts are memory-mapped on load.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+ARTIFACT_DIR = "artifacts"
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's contents, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def hash_sources(sources: list) -> dict:
+    """{path: SHA-256} of every source file, as recorded in the manifest."""
+    return {path: file_hash(path) for path in sources}
+
+
+class ArtifactStore:
+    def __init__(self, root: str = ARTIFACT_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_FILE)
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_atomic(self, path: str, write) -> None:
+        tmp = f"{path}.tmp.{os.getpid()}"
+        write(tmp)
+        os.replace(tmp, path)
+
+    def load(self, name: str, sources: list, extra: dict = None, hashes: dict = None):
+        """
+        Return the stored object if it was built from the current sources, else None.
+        hashes — hash_sources(sources) if the caller already computed it
+        """
+        entry = self._read_manifest().get(name)
+        if not entry or entry.get("format") != FORMAT_VERSION:
+            return None
+        if entry.get("sources") != (hash_sources(sources) if hashes is None else hashes):
+            return None
+        if entry.get("extra") != (extra or {}):
+            return None
+        import joblib
+        try:
+            return joblib.load(os.path.join(self.root, entry["file"]), mmap_mode="r")
+        except Exception as e:
+            print(f"[Artifacts] Could not load {name}: {e}")
+            return None
+
+    def save(self, name: str, obj, sources: list, extra: dict = None, hashes: dict = None) -> None:
+        """hashes — hash_sources(sources) taken before the object was built (default: now)"""
+        import joblib
+        os.makedirs(self.root, exist_ok=True)
+        filename = f"{name}.joblib"
+        self._write_atomic(os.path.join(self.root, filename), lambda tmp: joblib.dump(obj, tmp))
+
+        # Re-read right before writing so concurrent savers of other entries are kept
+        manifest = self._read_manifest()
+        manifest[name] = {
+            "file": filename,
+            "format": FORMAT_VERSION,
+            "sources": hash_sources(sources) if hashes is None else hashes,
+            "extra": extra or {},
+            "created": datetime.now().isoformat(),
+        }
+
+        def write_manifest(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+
+        self._write_atomic(self.manifest_path, write_manifest)
+
+    def entries(self) -> dict:
+        return self._read_manifest()
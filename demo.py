@@ -149,13 +149,19 @@ section[data-testid="stSidebar"] { display: none !important; }
 """, unsafe_allow_html=True)
 
 # ── Load model ────────────────────────────────────────────────────────────────
+# Wording of the degraded-verdict caption for each phase
+PHASE_LABELS = {"phase1": "pattern rules", "phase2": "semantic similarity", "phase3": "the ML classifier"}
+
+# Phase 1 is ready immediately; Phase 3 and Phase 2 keep loading in the background,
+# so the page renders right away and early verdicts come from the loaded phases.
+# The cached instance would otherwise outlive edits to rules.json / attacks.txt;
+# the reload watcher swaps rebuilt engines into it.
 @st.cache_resource(show_spinner=False)
 def load_guardian():
     from detector import LLMGuardian
-    return LLMGuardian()
+    return LLMGuardian(startup="background", reload_interval=2.0)
 
-with st.spinner(""):
-    guardian = load_guardian()
+guardian = load_guardian()
 
 # ── Layout ────────────────────────────────────────────────────────────────────
 st.markdown('<div class="brand">AI Security</div>', unsafe_allow_html=True)
@@ -221,4 +227,10 @@ if clicked:
         </div>
         """, unsafe_allow_html=True)
 
+        if result["not_ready_phases"]:
+            used = [label for name, label in PHASE_LABELS.items() if name not in result["not_ready_phases"]]
+            status = ("Some models failed to load" if guardian.readiness()["state"] == "failed"
+                      else "Models are still loading")
+            st.caption(f"{status} — this verdict is based on {' and '.join(used)} only.")
+
 st.markdown('<div class="footer">LLM Guardian V2 &nbsp;·&nbsp; 3-Phase AI Firewall</div>', unsafe_allow_html=True)
\ No newline at end of file
@@ -1,69 +1,169 @@
 import time
 import os
-import csv
-import pandas as pd
-from datetime import datetime
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import f1_score, accuracy_score
+import sys
+import hashlib
+import uuid
+import threading
+import copy
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeout
+import numpy as np
+from collections import Counter
+from datetime import datetime, timedelta
 
+import metrics
+from artifacts import ArtifactStore, ARTIFACT_DIR, hash_sources
+from cache import LRUCache
+from feedback_store import get_feedback_store, close_feedback_store
+from near_duplicate import NearDuplicateIndex
 from preprocessor import get_preprocessor
-from phase1_rules import Phase1Rules
-from phase2_semantic import Phase2Semantic
+from phase1_rules import Phase1Rules, RULES_FILE
+from phase2_semantic import Phase2Semantic, MODEL_NAME, ATTACKS_FILE
+from phase3_compiled import CompiledTfidfLogistic, PROBES
 
 DATA_FILE = "jailbreak_data.csv"
-FEEDBACK_FILE = "feedback.csv"
+
+# Risk = 0.25×P1 + 0.35×P2 + 0.40×P3
+PHASE_WEIGHTS = {"phase1": 0.25, "phase2": 0.35, "phase3": 0.40}
+BLOCK_THRESHOLD = 0.45
+ALLOW_THRESHOLD = 0.2
+# Cascade mode runs phases cheapest first: regex → TF-IDF → embedding
+CASCADE_ORDER = ("phase1", "phase3", "phase2")
+# eager: load every phase in __init__; lazy: on first use; background: warm up in a thread
+STARTUP_MODES = ("eager", "lazy", "background")
+# Share of rows Phase 3 holds out for accuracy/F1
+HOLDOUT_FRACTION = 0.2
+# Source files that can be hot-reloaded into a running guardian
+RELOAD_SOURCES = {"phase1": RULES_FILE, "phase2": ATTACKS_FILE}
 
 
 # ─────────────────────────────────────────────
 # Phase 3: ML Model (trained from CSV + feedback)
 # ─────────────────────────────────────────────
 class Phase3ML:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(max_features=5000, ngram_range=(1, 2))
-        self.model = LogisticRegression(C=1.0, max_iter=1000, random_state=42)
+    ARTIFACT = "phase3_tfidf_logreg"
+    # Batches up to this size are scored by the compiled model instead of sklearn
+    FAST_PATH_MAX_BATCH = 64
+    # Largest probability difference from sklearn the compiled model may show
+    FAST_PATH_TOLERANCE = 1e-9
+
+    def __init__(self, store: ArtifactStore = None):
+        self.vectorizer, self.model = self._new_estimators()
         self.accuracy = 0.0
         self.f1 = 0.0
         self.train_count = 0
-        self._train()
+        self.watermark = 0        # id of the newest feedback row the model was trained on
+        self.version = None       # changes whenever the fitted model does
+        self.compiled = None      # CompiledTfidfLogistic of the current model, if it verified
+        self.holdout = None       # (texts, labels) held out by the last full train in this process
+        self.source_hashes = None # hashes of the source files, taken before they were read
+        self._counting = None     # (version, CountVectorizer, TfidfTransformer) split of the vectorizer
+        self.store = store
+        if not self._load_artifact():
+            self._train()
+            self._save_artifact()
 
-    def _load_data(self):
-        """Load base dataset + any human feedback."""
-        df = pd.read_csv(DATA_FILE).dropna(subset=["text", "label"])
+    def _new_estimators(self) -> tuple:
+        # sklearn/pandas are imported where used so `import detector` stays fast
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        return (
+            TfidfVectorizer(max_features=5000, ngram_range=(1, 2)),
+            LogisticRegression(C=1.0, max_iter=1000, random_state=42),
+        )
 
-        # Append feedback if it exists
-        if os.path.exists(FEEDBACK_FILE):
-            try:
-                fb = pd.read_csv(FEEDBACK_FILE).dropna(subset=["text", "label"])
-                if len(fb) > 0:
-                    df = pd.concat([df, fb[["text", "label"]]], ignore_index=True)
-                    print(f"[Phase3] Loaded {len(fb)} feedback samples.")
-            except Exception as e:
-                print(f"[Phase3] Could not load feedback: {e}")
+    def _artifact_key(self) -> dict:
+        import sklearn
+        # Feedback is tracked by watermark (see _catch_up), not by hashing the store
+        return {"sources": [DATA_FILE], "extra": {"sklearn": sklearn.__version__}}
+
+    def _load_artifact(self) -> bool:
+        if self.store is None:
+            return False
+        key = self._artifact_key()
+        hashes = hash_sources(key["sources"])
+        state = self.store.load(self.ARTIFACT, hashes=hashes, **key)
+        if state is None:
+            return False
+        self.source_hashes = hashes
+        self._restore(state)
+        print(f"[Phase3] Loaded trained model from artifacts ({self.train_count} samples, F1: {self.f1}%).")
+        return self._catch_up()
+
+    def _catch_up(self) -> bool:
+        """After loading an artifact: False (retrain) if feedback arrived since it was trained."""
+        new_rows = get_feedback_store().watermark() > self.watermark
+        if new_rows:
+            print("[Phase3] New feedback since the cached model; retraining.")
+        return not new_rows
 
-        return df["text"].astype(str).tolist(), df["label"].astype(int).tolist()
+    def _save_artifact(self):
+        if self.store is None:
+            return
+        self.store.save(self.ARTIFACT, self._state(), hashes=self.source_hashes, **self._artifact_key())
+
+    def _state(self) -> dict:
+        return {
+            "vectorizer": self.vectorizer,
+            "model": self.model,
+            "accuracy": self.accuracy,
+            "f1": self.f1,
+            "train_count": self.train_count,
+            "watermark": self.watermark,
+        }
+
+    def _restore(self, state: dict):
+        self.vectorizer = state["vectorizer"]
+        self.model = state["model"]
+        self.accuracy = state["accuracy"]
+        self.f1 = state["f1"]
+        self.train_count = state["train_count"]
+        self.watermark = state.get("watermark", 0)
+        self.version = uuid.uuid4().hex[:12]
+        self._compile()
+
+    def _load_data(self) -> tuple:
+        """Base dataset + all human feedback, and the feedback watermark they cover."""
+        import pandas as pd
+        df = pd.read_csv(DATA_FILE).dropna(subset=["text", "label"])
+        texts, labels = df["text"].astype(str).tolist(), df["label"].astype(int).tolist()
+
+        fb_texts, fb_labels, watermark = get_feedback_store().since(0)
+        if fb_texts:
+            print(f"[Phase3] Loaded {len(fb_texts)} feedback samples.")
+        return texts + fb_texts, labels + fb_labels, watermark
 
     def _train(self):
-        X, y = self._load_data()
+        # Hashed before reading: an edit during training must not be recorded as trained on
+        self.source_hashes = hash_sources(self._artifact_key()["sources"])
+        X, y, self.watermark = self._load_data()
         self.train_count = len(X)
 
+        train_idx, test_idx = holdout_split(X)
+        y = np.asarray(y)
         X_vec = self.vectorizer.fit_transform(X)
-        X_train, X_test, y_train, y_test = train_test_split(
-            X_vec, y, test_size=0.2, random_state=42, stratify=y
-        )
-        self.model.fit(X_train, y_train)
+        self.model.fit(X_vec[train_idx], y[train_idx])
+        self.version = uuid.uuid4().hex[:12]
+        self._compile(X[::10])
 
-        y_pred = self.model.predict(X_test)
-        self.accuracy = round(accuracy_score(y_test, y_pred) * 100, 1)
-        self.f1 = round(f1_score(y_test, y_pred) * 100, 1)
+        self.holdout = ([X[i] for i in test_idx], y[test_idx].tolist())
+        scores = self.evaluate(*self.holdout)
+        self.accuracy, self.f1 = scores["accuracy"], scores["f1"]
         print(f"[Phase3] Trained on {self.train_count} samples — Accuracy: {self.accuracy}%, F1: {self.f1}%")
 
+    def evaluate(self, texts: list, labels: list) -> dict:
+        """Accuracy and F1 (percent) of the current model on labeled texts."""
+        from sklearn.metrics import f1_score, accuracy_score
+        y_pred = self.model.predict(self.vectorizer.transform(texts))
+        return {"accuracy": round(accuracy_score(labels, y_pred) * 100, 1),
+                "f1": round(f1_score(labels, y_pred) * 100, 1)}
+
     def retrain(self) -> dict:
         """Retrain model including feedback data. Returns improvement stats."""
         old_acc = self.accuracy
         old_f1 = self.f1
         self._train()
+        self._save_artifact()
         return {
             "old_accuracy": old_acc,
             "new_accuracy": self.accuracy,
@@ -73,80 +173,815 @@ class Phase3ML:
             "improved": self.accuracy > old_acc
         }
 
+    def _compile(self, texts: list = ()):
+        """Build the fast scoring path for the current model, keeping it only if it matches sklearn."""
+        try:
+            compiled = CompiledTfidfLogistic(self.vectorizer, self.model)
+            error = compiled.verify(self.vectorizer, self.model, PROBES + list(texts))
+        except Exception as e:
+            print(f"[Phase3] Compiled fast path unavailable: {e}")
+            compiled, error = None, 0.0
+        if error > self.FAST_PATH_TOLERANCE:
+            print(f"[Phase3] Compiled fast path disabled: differs from sklearn by {error:.2e}")
+            compiled = None
+        self.compiled = compiled
+
     def predict(self, prompt: str) -> dict:
-        X = self.vectorizer.transform([prompt])
-        proba = self.model.predict_proba(X)[0]
-        score = float(proba[1])
+        return self.predict_batch([prompt])[0]
+
+    def predict_batch(self, prompts: list) -> list:
+        """
+        Score many prompts with one sparse transform and one predict_proba call;
+        small batches go through the compiled model, which skips sklearn's overhead.
+        """
+        if not prompts:
+            return []
+        compiled = self.compiled
+        if compiled is not None and len(prompts) <= self.FAST_PATH_MAX_BATCH:
+            with metrics.stage("phase3.compiled"):
+                return [self._result(compiled.predict_proba(p)) for p in prompts]
+        with metrics.stage("phase3.vectorize"):
+            X = self.vectorizer.transform(prompts)
+        return self._predict_features(X)
+
+    def feature_counts(self, texts: list):
+        """
+        Raw n-gram counts (before idf weighting and normalization). Counts of
+        consecutive pieces of a text add up, which lets sessions update one
+        vector per chunk instead of re-vectorizing the whole conversation.
+        """
+        counter, _ = self._count_pipeline()
+        return counter.transform(texts)
+
+    def predict_from_counts(self, counts) -> list:
+        """predict_batch() for rows of feature_counts(): same scores as the concatenated texts."""
+        _, weighting = self._count_pipeline()
+        with metrics.stage("phase3.vectorize"):
+            X = weighting.transform(counts)
+        return self._predict_features(X)
+
+    def _count_pipeline(self) -> tuple:
+        """
+        The fitted TfidfVectorizer as an equivalent CountVectorizer + TfidfTransformer
+        pair (same vocabulary, idf and settings), rebuilt whenever the model changes.
+        """
+        from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+        cached = self._counting
+        if cached is not None and cached[0] == self.version:
+            return cached[1:]
+        params = self.vectorizer.get_params()
+        weighting_params = {k: params.pop(k) for k in ("norm", "use_idf", "smooth_idf", "sublinear_tf")}
+        params.update(vocabulary=self.vectorizer.vocabulary_, max_features=None)
+        counter = CountVectorizer(**params)
+        weighting = TfidfTransformer(**weighting_params)
+        if weighting.use_idf:
+            weighting.idf_ = self.vectorizer.idf_
+        self._counting = (self.version, counter, weighting)
+        return counter, weighting
+
+    def tokens(self, text: str) -> list:
+        """The vectorizer's unigram tokens of a text."""
+        return self.vectorizer.build_tokenizer()(self.vectorizer.build_preprocessor()(text))
+
+    def _predict_features(self, X) -> list:
+        with metrics.stage("phase3.predict"):
+            proba = self.model.predict_proba(X)[:, 1]
+        return [self._result(float(p)) for p in proba]
+
+    @staticmethod
+    def _result(score: float) -> dict:
         return {
             "score": round(score, 3),
             "explanation": f"ML confidence: {score*100:.1f}% attack probability"
         }
 
 
+class Phase3Incremental(Phase3ML):
+    """
+    Online variant of Phase 3: a stateless HashingVectorizer feeding an SGD
+    logistic-regression model. New feedback is read from the store past the
+    model's watermark and learned with partial_fit in small batches, also when
+    a cached model is loaded; retrain() still does a full refit for drift
+    correction. Accuracy/F1 are always measured on the same held-out split as _train.
+    """
+    ARTIFACT = "phase3_hashing_sgd"
+    CLASSES = [0, 1]
+    N_FEATURES = 2 ** 18
+
+    def __init__(self, store: ArtifactStore = None, batch_size: int = 32, epochs: int = 5,
+                 refit_every: int = None):
+        """
+        batch_size  — new feedback rows that trigger a partial_fit
+        epochs      — passes over the training split on a full refit
+        refit_every — optionally do a full refit after this many incremental rows
+        """
+        self.batch_size = batch_size
+        self.epochs = epochs
+        self.refit_every = refit_every
+        self.updates = 0
+        self.X_test = None
+        self.y_test = None
+        self._unseen = 0
+        self._lock = threading.Lock()
+        super().__init__(store)
+
+    def __getstate__(self):
+        # Locks can't be pickled (background retrains return models across processes)
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _new_estimators(self) -> tuple:
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.linear_model import SGDClassifier
+        return (
+            HashingVectorizer(n_features=self.N_FEATURES, ngram_range=(1, 2), alternate_sign=False),
+            SGDClassifier(loss="log_loss", alpha=1e-5, random_state=42),
+        )
+
+    def _artifact_key(self) -> dict:
+        key = super()._artifact_key()
+        key["extra"]["n_features"] = self.N_FEATURES
+        return key
+
+    def _state(self) -> dict:
+        state = super()._state()
+        state.update({"updates": self.updates, "X_test": self.X_test, "y_test": self.y_test})
+        return state
+
+    def _restore(self, state: dict):
+        super()._restore(state)
+        self.updates = state["updates"]
+        self.X_test = state["X_test"]
+        self.y_test = state["y_test"]
+
+    def _catch_up(self) -> bool:
+        # Learn only the rows added since the artifact was saved, no refit
+        with self._lock:
+            self._flush()
+        return True
+
+    def _compile(self, texts: list = ()):
+        # The SGD model changes with every partial_fit; it is always scored through sklearn
+        self.compiled = None
+
+    def feature_counts(self, texts: list):
+        from sklearn.base import clone
+        return clone(self.vectorizer).set_params(norm=None).transform(texts)
+
+    def predict_from_counts(self, counts) -> list:
+        from sklearn.preprocessing import normalize
+        with metrics.stage("phase3.vectorize"):
+            X = normalize(counts, norm=self.vectorizer.norm)
+        return self._predict_features(X)
+
+    def _evaluate(self):
+        from sklearn.metrics import f1_score, accuracy_score
+        y_pred = self.model.predict(self.X_test)
+        self.accuracy = round(accuracy_score(self.y_test, y_pred) * 100, 1)
+        self.f1 = round(f1_score(self.y_test, y_pred) * 100, 1)
+
+    def _train(self):
+        # Hashed before reading: an edit during training must not be recorded as trained on
+        self.source_hashes = hash_sources(self._artifact_key()["sources"])
+        X, y, self.watermark = self._load_data()
+        self.train_count = len(X)
+        self._unseen = 0
+
+        train_idx, test_idx = holdout_split(X)
+        y = np.asarray(y)
+        X_vec = self.vectorizer.transform(X)
+        X_train, y_train = X_vec[train_idx], y[train_idx]
+        self.X_test, self.y_test = X_vec[test_idx], y[test_idx].tolist()
+        self.holdout = ([X[i] for i in test_idx], self.y_test)
+        _, model = self._new_estimators()
+        rng = np.random.RandomState(42)
+        for _ in range(self.epochs):
+            order = rng.permutation(X_train.shape[0])
+            model.partial_fit(X_train[order], y_train[order], classes=self.CLASSES)
+        self.model = model
+        self.version = uuid.uuid4().hex[:12]
+        self.updates = 0
+
+        self._evaluate()
+        print(f"[Phase3] Trained on {self.train_count} samples — Accuracy: {self.accuracy}%, F1: {self.f1}%")
+
+    def notify_feedback(self, count: int = 1) -> bool:
+        """Note rows added to the feedback store; returns True if they triggered a model update."""
+        with self._lock:
+            self._unseen += count
+            if self._unseen < self.batch_size:
+                return False
+            self._flush()
+        return True
+
+    def flush(self):
+        """Learn every row past the watermark now, regardless of batch size."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._unseen = 0
+        texts, labels, watermark = get_feedback_store().since(self.watermark)
+        if not texts:
+            return
+
+        # Update a copy and swap it in, so concurrent predict() never sees a half-applied step
+        model = copy.deepcopy(self.model)
+        model.partial_fit(self.vectorizer.transform(texts), labels, classes=self.CLASSES)
+        self.model = model
+        self.version = uuid.uuid4().hex[:12]
+        self.watermark = watermark
+        self.train_count += len(texts)
+        self.updates += len(texts)
+        self._evaluate()
+        print(f"[Phase3] Learned {len(texts)} feedback rows — Accuracy: {self.accuracy}%, F1: {self.f1}%")
+
+        if self.refit_every and self.updates >= self.refit_every:
+            self._train()
+        self._save_artifact()
+
+
+PHASE3_MODES = {"batch": Phase3ML, "incremental": Phase3Incremental}
+
+
+def _build_phase3(mode: str) -> Phase3ML:
+    """Train a fresh Phase 3 model; runs in a worker process for background retrains."""
+    return PHASE3_MODES[mode](store=None)
+
+
+def _copy_phases(phases: dict) -> dict:
+    """Copy of per-phase results deep enough that callers can't mutate cached entries."""
+    return {
+        name: {k: (list(v) if isinstance(v, list) else dict(v) if isinstance(v, dict) else v)
+               for k, v in out.items()}
+        for name, out in phases.items()
+    }
+
+
+def holdout_split(texts: list) -> tuple:
+    """
+    (train, test) row indices of Phase 3's held-out split. A row's side depends only
+    on its text, so models trained on different snapshots of the data (e.g. before and
+    after new feedback) hold out the same rows and can be compared on them.
+    """
+    cut = int(HOLDOUT_FRACTION * 2 ** 64)
+    test = [int.from_bytes(hashlib.sha256(t.encode("utf-8")).digest()[:8], "big") < cut for t in texts]
+    return ([i for i, held in enumerate(test) if not held],
+            [i for i, held in enumerate(test) if held])
+
+
+def _phase3_metrics(phase3: Phase3ML) -> dict:
+    return {"accuracy": phase3.accuracy, "f1": phase3.f1, "train_count": phase3.train_count}
+
+
+def _file_stamp(path: str):
+    """(mtime_ns, size) of a file, or None if it doesn't exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
 # ─────────────────────────────────────────────
 # Feedback Store
 # ─────────────────────────────────────────────
 def save_feedback(text: str, label: int, source: str = "human"):
-    """Save a human-labeled prompt to feedback.csv."""
-    file_exists = os.path.exists(FEEDBACK_FILE)
-    with open(FEEDBACK_FILE, "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["text", "label", "timestamp", "source"])
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow({
-            "text": text,
-            "label": label,
-            "timestamp": datetime.now().isoformat(),
-            "source": source
-        })
+    """Save a human-labeled prompt to the feedback store (committed in batches, deduplicated)."""
+    get_feedback_store().add(text, label, source)
 
 def get_feedback_count() -> int:
-    if not os.path.exists(FEEDBACK_FILE):
-        return 0
-    try:
-        df = pd.read_csv(FEEDBACK_FILE)
-        return len(df)
-    except:
-        return 0
+    return get_feedback_store().count()
 
 
 # ─────────────────────────────────────────────
 # Hybrid Detector — combines all phases
 # ─────────────────────────────────────────────
 class LLMGuardian:
-    def __init__(self):
+    def __init__(self, semantic_backend: str = "numpy", embedding_cache_size: int = 4096,
+                 cascade: bool = False, artifact_dir: str = ARTIFACT_DIR,
+                 parallel: bool = False, phase_timeout=None, ml_mode: str = "batch",
+                 retrain_tolerance: float = 1.0, long_prompt_mode: bool = False,
+                 verdict_cache_size: int = 0, verdict_cache_bytes: int = 64 << 20,
+                 near_duplicate_size: int = 0, near_duplicate_threshold: float = 0.8,
+                 profiler: metrics.SlowRequestProfiler = None, startup: str = "eager",
+                 serve_degraded: bool = None, reload_interval: float = None,
+                 load_retry_backoff: float = 60.0):
+        """
+        artifact_dir  — where fitted models/embeddings are cached across restarts (None disables)
+        parallel      — run the three phases concurrently on a shared thread pool
+        phase_timeout — seconds each parallel phase may take, as one number or {phase: seconds};
+                        late phases score 0.0. A late run is abandoned but keeps executing (and
+                        using CPU) until it finishes; until then that phase is not started again
+                        and scores 0.0 straight away
+        ml_mode       — "batch" (TF-IDF + LogisticRegression) or "incremental" (online SGD)
+        retrain_tolerance — max F1 drop (points) a background retrain may cause and still be swapped in
+        long_prompt_mode  — Phase 2 scans the whole prompt with overlapping windows
+        verdict_cache_size  — cache phase results of up to this many distinct cleaned prompts (0 disables)
+        verdict_cache_bytes — memory cap for the verdict cache
+        near_duplicate_size — remember the Phase 2 results of up to this many recent prompts and reuse
+                              them for prompts with shingle Jaccard ≥ near_duplicate_threshold (0 disables)
+        profiler      — optional metrics.SlowRequestProfiler sampling slow analyze_batch calls
+        startup       — "eager" (load every phase now), "lazy" (load each phase on first use) or
+                        "background" (Phase 1 now, Phase 3 and Phase 2 in a warmup thread)
+        serve_degraded — while Phase 2/3 are still loading, answer from the loaded phases instead
+                         of waiting (default: True for background startup)
+        reload_interval — poll rules.json, attacks.txt and fingerprints.log every this many seconds
+                          and hot-reload changes (None: only on reload() calls)
+        load_retry_backoff — after a phase fails to load, seconds before it is tried again
+                             (warmup(retry=True) and reload() retry straight away)
+        """
+        if startup not in STARTUP_MODES:
+            raise ValueError(f"Unknown startup mode {startup!r}; choose from {', '.join(STARTUP_MODES)}")
         print("Initializing LLM Guardian V2...")
+        self.cascade = cascade
+        self.parallel = parallel
+        self.phase_timeout = phase_timeout
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._abandoned = {name: 0 for name in PHASE_WEIGHTS}   # timed-out runs still executing
+        self.store = ArtifactStore(artifact_dir) if artifact_dir else None
         self.preprocessor = get_preprocessor()
-        self.phase1 = Phase1Rules()
-        self.phase2 = Phase2Semantic()
-        self.phase3 = Phase3ML()
-        print("✅ All systems online.")
+        self.semantic_backend = semantic_backend
+        self.embedding_cache_size = embedding_cache_size
+        self.long_prompt_mode = long_prompt_mode
+        self.ml_mode = ml_mode
+        self.serve_degraded = startup == "background" if serve_degraded is None else serve_degraded
+        self._engines = {}      # phase name → loaded engine
+        self._load_locks = {name: threading.Lock() for name in PHASE_WEIGHTS}
+        self._load_state = {name: {"state": "pending"} for name in PHASE_WEIGHTS}
+        self.load_retry_backoff = load_retry_backoff
+        self._retry_after = {}  # phase name → monotonic time before which a failed load isn't retried
+        self._warmup_lock = threading.Lock()
+        self._warmup_thread = None
+        self.retrain_tolerance = retrain_tolerance
+        self.profiler = profiler
+        self._retrain_lock = threading.Lock()
+        self._retrain_status = {"state": "idle"}
+        self._retrain_thread = None
+        # Keyed by hash of cleaned text + engine versions, so retrains/rule changes never hit stale entries
+        self.verdict_cache = (LRUCache(maxsize=verdict_cache_size, max_bytes=verdict_cache_bytes)
+                              if verdict_cache_size else None)
+        # Phase 1 and Phase 3 are cheap and always re-run; only the embedding search is reused
+        self.near_duplicates = (NearDuplicateIndex(maxsize=near_duplicate_size, threshold=near_duplicate_threshold)
+                                if near_duplicate_size else None)
+        self._reload_lock = threading.Lock()
+        self._reload_stamps = {}       # phase name → (mtime, size) of the source it was built from
+        self._reload_status = {"state": "idle"}
+        self._watcher = None
+        self._watch_interval = None
+        self._watch_stop = threading.Event()
+        if reload_interval:
+            self.watch(reload_interval)
+
+        if startup == "eager":
+            self.warmup(background=False)
+            print("✅ All systems online.")
+            return
+        # Rules compile in milliseconds, so Phase 1 is always available for degraded verdicts
+        self._engine("phase1")
+        if startup == "background":
+            self.warmup()
+            print("[Guardian] Phase 1 ready; loading Phase 3 and Phase 2 in the background.")
+
+    # ── Lazy phase loading ────────────────────────────────────────────────────
+    @property
+    def phase1(self) -> Phase1Rules:
+        return self._engine("phase1")
+
+    @phase1.setter
+    def phase1(self, engine: Phase1Rules):
+        self._engines["phase1"] = engine
+
+    @property
+    def phase2(self) -> Phase2Semantic:
+        return self._engine("phase2")
 
-    def analyze(self, prompt: str) -> dict:
+    @phase2.setter
+    def phase2(self, engine: Phase2Semantic):
+        self._engines["phase2"] = engine
+
+    @property
+    def phase3(self) -> Phase3ML:
+        return self._engine("phase3")
+
+    @phase3.setter
+    def phase3(self, engine: Phase3ML):
+        self._engines["phase3"] = engine
+
+    def _engine(self, name: str):
+        """The loaded engine for a phase, loading it now (once, under a lock) if needed."""
+        engine = self._engines.get(name)
+        if engine is not None:
+            return engine
+        with self._load_locks[name]:
+            engine = self._engines.get(name)
+            if engine is None:
+                if self._backing_off(name):
+                    state = self._load_state[name]
+                    raise RuntimeError(f"{name} failed to load ({state['error']}); not retried "
+                                       f"before {state['retry_at']}")
+                engine = self._load_engine(name)
+        return engine
+
+    def _backing_off(self, name: str) -> bool:
+        """True while a failed load of this phase must not be retried yet."""
+        return time.monotonic() < self._retry_after.get(name, 0.0)
+
+    def _load_engine(self, name: str):
+        self._load_state[name] = {"state": "loading"}
+        start = time.perf_counter()
+        if name in RELOAD_SOURCES:
+            # Stamped before reading, so an edit during the load still triggers a reload
+            self._reload_stamps[name] = _file_stamp(RELOAD_SOURCES[name])
+        try:
+            if name == "phase1":
+                engine = Phase1Rules(store=self.store)
+            elif name == "phase2":
+                engine = Phase2Semantic(backend=self.semantic_backend, cache_size=self.embedding_cache_size,
+                                        store=self.store, long_prompt_mode=self.long_prompt_mode)
+            else:
+                engine = PHASE3_MODES[self.ml_mode](store=self.store)
+        except Exception as e:
+            # Loading again on every request would just fail again at full cost
+            self._retry_after[name] = time.monotonic() + self.load_retry_backoff
+            now = datetime.now()
+            self._load_state[name] = {
+                "state": "failed", "error": repr(e), "failed_at": now.isoformat(),
+                "retry_at": (now + timedelta(seconds=self.load_retry_backoff)).isoformat(),
+            }
+            raise
+        self._retry_after.pop(name, None)
+        self._engines[name] = engine
+        self._load_state[name] = {"state": "ready", "load_s": round(time.perf_counter() - start, 3)}
+        return engine
+
+    def warmup(self, background: bool = True, retry: bool = False):
+        """
+        Load every phase not loaded yet, cheapest first. Phases whose load failed are
+        skipped until load_retry_backoff expires, or retried now with retry=True.
+        Returns the warmup thread if background (None if nothing is left to load).
+        """
+        if retry:
+            self._retry_after.clear()
+        if not background:
+            for name in CASCADE_ORDER:
+                self._engine(name)
+            return None
+        with self._warmup_lock:
+            due = [name for name in CASCADE_ORDER if name not in self._engines and not self._backing_off(name)]
+            if not due:
+                return self._warmup_thread
+            if self._warmup_thread is None or not self._warmup_thread.is_alive():
+                self._warmup_thread = threading.Thread(target=self._background_warmup,
+                                                       name="guardian-warmup", daemon=True)
+                self._warmup_thread.start()
+            return self._warmup_thread
+
+    def _background_warmup(self):
+        for name in CASCADE_ORDER:
+            if name in self._engines or self._backing_off(name):
+                continue
+            try:
+                self._engine(name)
+            except Exception as e:
+                print(f"[Guardian] Could not load {name}: {e} "
+                      f"(retrying after {self._load_state[name].get('retry_at')})")
+        if self.ready:
+            print("✅ All systems online.")
+
+    @property
+    def ready(self) -> bool:
+        """True once every phase is loaded (full-quality verdicts)."""
+        return len(self._engines) == len(PHASE_WEIGHTS)
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """Block until all phases are loaded (starting the warmup if needed) or timeout expires."""
+        if not self.ready:
+            thread = self.warmup()
+            if thread is not None:
+                thread.join(timeout)
+        return self.ready
+
+    def readiness(self) -> dict:
+        """state: "ready", "loading", or "failed" if any phase failed to load (see phases)."""
+        failed = [name for name, state in self._load_state.items() if state["state"] == "failed"]
+        return {
+            "ready": self.ready,
+            "state": "ready" if self.ready else "failed" if failed else "loading",
+            "failed_phases": failed,
+            "serve_degraded": self.serve_degraded,
+            "phases": {name: dict(state) for name, state in self._load_state.items()},
+        }
+
+    def analyze(self, prompt: str, cascade: bool = None, parallel: bool = None) -> dict:
+        return self.analyze_batch([prompt], cascade=cascade, parallel=parallel)[0]
+
+    def analyze_batch(self, prompts: list, cascade: bool = None, parallel: bool = None) -> list:
+        """
+        Analyze many prompts at once. Preprocessing and rules run per prompt,
+        Phase 2 embeds every subphrase in one pass and Phase 3 scores the whole
+        batch with one predict_proba. latency_ms is the batch time per prompt.
+
+        With cascade=True (default: the instance setting) phases run cheapest
+        first and a prompt stops as soon as its verdict can no longer change;
+        skipped phases score 0.0 and are listed in "skipped_phases".
+
+        With parallel=True the phases run concurrently instead (cascade takes
+        precedence). Phases still running after their phase_timeout score 0.0
+        and are listed in "timed_out_phases".
+
+        With the verdict cache enabled, prompts whose cleaned text was already
+        scored by the same rules/fingerprints/model skip all three phases and
+        are marked "cache_hit".
+
+        Stage timings, verdict and rule-match counts are recorded in the
+        metrics registry (see metrics.py).
+        """
+        if not prompts:
+            return []
+        if self.profiler is None:
+            results = self._analyze_batch(prompts, cascade, parallel)
+        else:
+            with self.profiler.profile(f"analyze_batch({len(prompts)})"):
+                results = self._analyze_batch(prompts, cascade, parallel)
+        self._record_metrics(results)
+        return results
+
+    def _analyze_batch(self, prompts: list, cascade: bool, parallel: bool) -> list:
+        cascade = self.cascade if cascade is None else cascade
+        parallel = self.parallel if parallel is None else parallel
         start = time.time()
 
-        # Pre-process first
-        pre = self.preprocessor.process(prompt)
-        cleaned = pre["cleaned"]
+        # Snapshot the engines so a concurrent hot-swap never mixes models within a call
+        engines = self._snapshot_engines()
+        not_ready = [name for name, engine in engines.items() if engine is None]
+        with metrics.stage("preprocess"):
+            pres = [self.preprocessor.process(p) for p in prompts]
+        cleaned = [pre["cleaned"] for pre in pres]
+
+        phases = [{} for _ in prompts]
+        # Degraded results are never cached: they'd outlive the warmup
+        keys = None if not_ready else self._cache_keys(engines, cleaned, cascade)
+        if keys:
+            with metrics.stage("verdict_cache"):
+                for i, key in enumerate(keys):
+                    cached = self.verdict_cache.get(key)
+                    if cached is not None:
+                        phases[i] = _copy_phases(cached)
+        misses = [i for i, done in enumerate(phases) if not done]
+
+        near, probes = {}, {}
+        if misses and self.near_duplicates is not None and engines["phase2"] is not None:
+            with metrics.stage("near_duplicate"):
+                for i in misses:
+                    probes[i] = self.near_duplicates.probe(cleaned[i])
+                    match = self.near_duplicates.lookup(probes[i], engines["phase2"].version)
+                    if match is not None:
+                        (p2, source), similarity = match
+                        phases[i].update(_copy_phases({"phase2": p2}))
+                        near[i] = {"similarity": similarity, "matched": source}
+        full = [i for i in misses if i not in near]
+
+        timings = {}
+        timed_out = {}
+        sequential = misses
+        if full and parallel and not cascade:
+            timed_out = self._run_parallel(engines, [cleaned[i] for i in full],
+                                           [phases[i] for i in full], timings)
+            sequential = list(near)
+        if sequential:
+            for name in (CASCADE_ORDER if cascade else PHASE_WEIGHTS):
+                if engines[name] is None:
+                    continue
+                pending = [i for i in sequential
+                           if name not in phases[i] and not (cascade and self._settled(phases[i]))]
+                if not pending:
+                    continue
+                outputs, elapsed = self._timed_phase(engines, name, [cleaned[i] for i in pending])
+                timings[name] = round(elapsed * 1000 / len(pending), 2)
+                for i, out in zip(pending, outputs):
+                    phases[i][name] = out
+
+        for i in misses:
+            done = phases[i]
+            for name in PHASE_WEIGHTS:
+                if name in done:
+                    continue
+                if engines[name] is None:
+                    done[name] = {
+                        "score": 0.0,
+                        "matches": [],
+                        "top_match": None,
+                        "not_ready": True,
+                        "explanation": "Still loading — left out of the risk score"
+                    }
+                    continue
+                late = timed_out.get(name)
+                done[name] = {
+                    "score": 0.0,
+                    "matches": [],
+                    "top_match": None,
+                    "timed_out" if late else "skipped": True,
+                    "explanation": late or "Skipped — verdict already decided by earlier phases"
+                }
+            # Timeouts depend on load, not on the prompt, so those results aren't reusable;
+            # near-duplicate results are approximate and are never cached or re-shared
+            if i in near or timed_out:
+                continue
+            if keys:
+                self.verdict_cache.put(keys[i], _copy_phases(done))
+            if probes.get(i) is not None and not done["phase2"].get("skipped"):
+                self.near_duplicates.add(probes[i], (_copy_phases(done)["phase2"], cleaned[i][:200]),
+                                         engines["phase2"].version)
+
+        latency = round((time.time() - start) * 1000 / len(prompts), 1)
+        hits = set(range(len(prompts))).difference(misses)
+        results = []
+        for i, (prompt, pre, done) in enumerate(zip(prompts, pres, phases)):
+            result = self._build_result(prompt, pre, done["phase1"], done["phase2"], done["phase3"],
+                                        latency, engines["phase3"])
+            result["phase_latency_ms"] = dict(timings)
+            result["skipped_phases"] = [name for name in PHASE_WEIGHTS if done[name].get("skipped")]
+            result["timed_out_phases"] = [name for name in PHASE_WEIGHTS if done[name].get("timed_out")]
+            # Skipped and timed-out phases count as 0.0, so the score can only be too low
+            result["risk_score_is_lower_bound"] = bool(result["skipped_phases"] or result["timed_out_phases"])
+            result["not_ready_phases"] = list(not_ready)
+            if keys:
+                result["cache_hit"] = i in hits
+            if self.near_duplicates is not None:
+                result["near_duplicate"] = near.get(i)
+            result["versions"] = self._versions(engines)
+            results.append(result)
+        return results
+
+    def _snapshot_engines(self) -> dict:
+        """
+        Engines for one call. Normally waits for (or triggers) loading; with
+        serve_degraded, phases still loading come back as None instead.
+        """
+        if not self.serve_degraded or self.ready:
+            return {name: self._engine(name) for name in PHASE_WEIGHTS}
+        self.warmup()
+        engines = {name: self._engines.get(name) for name in PHASE_WEIGHTS}
+        engines["phase1"] = self._engine("phase1")
+        return engines
+
+    @staticmethod
+    def _record_metrics(results: list) -> None:
+        if not metrics.REGISTRY.enabled:
+            return
+        metrics.inc("guardian_prompts_total", len(results))
+        for verdict, n in Counter(r["verdict"] for r in results).items():
+            metrics.inc("guardian_verdicts_total", n, verdict=verdict)
+        for rule, n in Counter(m for r in results for m in r["phase1"]["matches"]).items():
+            metrics.inc("guardian_rule_matches_total", n, rule=rule)
+        hits = sum(1 for r in results if r.get("cache_hit"))
+        if hits:
+            metrics.inc("guardian_verdict_cache_hits_total", hits)
+        near = sum(1 for r in results if r.get("near_duplicate"))
+        if near:
+            metrics.inc("guardian_near_duplicate_hits_total", near)
+        if results[0]["not_ready_phases"]:
+            metrics.inc("guardian_degraded_verdicts_total", len(results))
+        # Every prompt in a batch shares the per-prompt latency
+        metrics.observe("guardian_request_duration_seconds", results[0]["latency_ms"] / 1000, len(results))
+
+    @staticmethod
+    def _versions(engines: dict) -> dict:
+        """Rule/fingerprint/model versions a result was computed with (None = phase not loaded)."""
+        return {
+            label: engines[name].version if engines.get(name) is not None else None
+            for label, name in (("rules", "phase1"), ("fingerprints", "phase2"), ("ml", "phase3"))
+        }
+
+    def _cache_keys(self, engines: dict, cleaned: list, cascade: bool) -> list:
+        """Verdict-cache key per cleaned prompt, or None when the cache is off."""
+        if self.verdict_cache is None:
+            return None
+        version = "|".join([engines["phase1"].version, engines["phase2"].version,
+                            engines["phase3"].version, "cascade" if cascade else "full"])
+        return [hashlib.sha256(f"{version}\0{text}".encode("utf-8")).digest() for text in cleaned]
+
+    def cache_stats(self) -> dict:
+        """Hit/miss/size counters of the verdict cache, near-duplicate index and Phase 2 embedding cache."""
+        return {
+            "verdict": self.verdict_cache.stats() if self.verdict_cache is not None else None,
+            "near_duplicate": self.near_duplicates.stats() if self.near_duplicates is not None else None,
+            "embedding": self._engines["phase2"].cache_stats() if "phase2" in self._engines else None,
+        }
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # At most one abandoned run per phase, so it gets its own headroom
+                self._pool = ThreadPoolExecutor(
+                    max_workers=max(len(PHASE_WEIGHTS), os.cpu_count() or 1) + len(PHASE_WEIGHTS),
+                    thread_name_prefix="guardian-phase"
+                )
+            return self._pool
+
+    def _phase_timeout(self, name: str):
+        if isinstance(self.phase_timeout, dict):
+            return self.phase_timeout.get(name)
+        return self.phase_timeout
+
+    def _run_parallel(self, engines: dict, cleaned: list, phases: list, timings: dict) -> dict:
+        """
+        Run every phase concurrently, each against its own deadline; fill phases/timings
+        and return {phase: explanation} for the phases that timed out or were not started.
+        """
+        pool = self._get_pool()
+        start = time.perf_counter()
+        late = {}
+        futures = {}
+        for name in PHASE_WEIGHTS:
+            if engines[name] is None:
+                continue
+            if self._abandoned[name]:
+                # Its last run timed out and is still executing; don't queue more work behind it
+                late[name] = "Previous run still executing after a timeout — not started, scored as 0.0"
+                metrics.inc("guardian_phase_saturated_total", phase=name)
+                continue
+            futures[name] = pool.submit(self._timed_phase, engines, name, cleaned)
+        for name, future in futures.items():
+            timeout = self._phase_timeout(name)
+            remaining = None if timeout is None else max(0.0, start + timeout - time.perf_counter())
+            try:
+                outputs, elapsed = future.result(timeout=remaining)
+            except FutureTimeout:
+                # Abandoned: the run can't be interrupted, its result is discarded when it ends
+                late[name] = f"Timed out after {timeout}s — scored as 0.0"
+                metrics.inc("guardian_phase_timeouts_total", phase=name)
+                with self._pool_lock:
+                    self._abandoned[name] += 1
+                future.add_done_callback(lambda _, name=name: self._release_abandoned(name))
+                continue
+            timings[name] = round(elapsed * 1000 / len(cleaned), 2)
+            for done, out in zip(phases, outputs):
+                done[name] = out
+        return late
 
-        # Run 3 phases on cleaned text
-        p1 = self.phase1.analyze(cleaned)
-        p2 = self.phase2.analyze(cleaned)
-        p3 = self.phase3.predict(cleaned)
+    def _release_abandoned(self, name: str):
+        with self._pool_lock:
+            self._abandoned[name] -= 1
 
-        # Weighted combination
-        risk_score = round(min(1.0,
-            0.25 * p1["score"] +
-            0.35 * p2["score"] +
-            0.40 * p3["score"]
+    def _timed_phase(self, engines: dict, name: str, texts: list) -> tuple:
+        start = time.perf_counter()
+        with metrics.stage(name):
+            outputs = self._run_phase(engines, name, texts)
+        return outputs, time.perf_counter() - start
+
+    @staticmethod
+    def _run_phase(engines: dict, name: str, texts: list) -> list:
+        if name == "phase1":
+            return [engines["phase1"].analyze(t) for t in texts]
+        if name == "phase2":
+            return engines["phase2"].analyze_batch(texts)
+        return engines["phase3"].predict_batch(texts)
+
+    @staticmethod
+    def _risk(s1: float, s2: float, s3: float) -> float:
+        return round(min(1.0,
+            PHASE_WEIGHTS["phase1"] * s1 +
+            PHASE_WEIGHTS["phase2"] * s2 +
+            PHASE_WEIGHTS["phase3"] * s3
         ), 4)
 
-        if risk_score >= 0.45:
-            verdict = "BLOCK"
-        elif risk_score < 0.2:
-            verdict = "ALLOW"
+    @staticmethod
+    def _verdict(risk_score: float) -> str:
+        if risk_score >= BLOCK_THRESHOLD:
+            return "BLOCK"
+        elif risk_score < ALLOW_THRESHOLD:
+            return "ALLOW"
+        return "REVIEW"
+
+    def _settled(self, done: dict) -> bool:
+        """True if no score for the phases not yet run could change the verdict."""
+        if len(done) == len(PHASE_WEIGHTS):
+            return True
+        low = [done[n]["score"] if n in done else 0.0 for n in PHASE_WEIGHTS]
+        high = [done[n]["score"] if n in done else 1.0 for n in PHASE_WEIGHTS]
+        return self._verdict(self._risk(*low)) == self._verdict(self._risk(*high))
+
+    def _build_result(self, prompt: str, pre: dict, p1: dict, p2: dict, p3: dict, latency: float,
+                      phase3: Phase3ML) -> dict:
+        outputs = {"phase1": p1, "phase2": p2, "phase3": p3}
+        ready = [name for name, out in outputs.items() if not out.get("not_ready")]
+        if len(ready) == len(outputs):
+            risk_score = self._risk(p1["score"], p2["score"], p3["score"])
         else:
-            verdict = "REVIEW"
+            # Degraded: re-weight over the loaded phases (Phase 1 alone scores as itself)
+            risk_score = round(min(1.0, sum(PHASE_WEIGHTS[n] * outputs[n]["score"] for n in ready)
+                                   / sum(PHASE_WEIGHTS[n] for n in ready)), 4)
+        verdict = self._verdict(risk_score)
+        if verdict == "ALLOW" and pre.get("scan_truncated"):
+            verdict = "REVIEW"      # a capped decode may have left a payload unseen
 
         # Build explanation
         reasons = []
@@ -159,8 +994,6 @@ class LLMGuardian:
         if pre["was_modified"]:
             reasons.append(f"Obfuscation detected: {', '.join(pre['transformations'])}")
 
-        latency = round((time.time() - start) * 1000, 1)
-
         return {
             "prompt": prompt[:200],
             "risk_score": risk_score,
@@ -171,14 +1004,284 @@ class LLMGuardian:
             "phase2": p2,
             "phase3": p3,
             "reasons": reasons,
-            "model_accuracy": self.phase3.accuracy,
-            "model_f1": self.phase3.f1,
-            "train_count": self.phase3.train_count,
+            "model_accuracy": phase3.accuracy if phase3 else None,
+            "model_f1": phase3.f1 if phase3 else None,
+            "train_count": phase3.train_count if phase3 else None,
         }
 
+    def model_info(self) -> dict:
+        """Versions/sizes of the loaded models, for health checks and logs (None = still loading)."""
+        phase1, phase2, phase3 = (self._engines.get(name) for name in PHASE_WEIGHTS)
+        return {
+            "ready": self.ready,
+            "rules": len(phase1.rules) if phase1 else None,
+            "embedding_model": MODEL_NAME,
+            "semantic_index": self.semantic_backend,
+            "fingerprints": len(phase2.index) if phase2 else None,
+            "ml_mode": self.ml_mode,
+            "ml_train_count": phase3.train_count if phase3 else None,
+            "ml_accuracy": phase3.accuracy if phase3 else None,
+            "ml_f1": phase3.f1 if phase3 else None,
+            "rules_version": phase1.version if phase1 else None,
+            "fingerprints_version": phase2.version if phase2 else None,
+            "ml_version": phase3.version if phase3 else None,
+        }
+
+    # ── Retraining ────────────────────────────────────────────────────────────
     def retrain(self) -> dict:
-        """Retrain Phase 3 with feedback data."""
-        return self.phase3.retrain()
+        """
+        Retrain Phase 3 with feedback data. A complete new model is built and
+        swapped in as one reference, so concurrent analyze calls never see a
+        half-fitted vectorizer/model pair.
+        """
+        old = self.phase3
+        new = PHASE3_MODES[self.ml_mode](store=None)
+        self._swap_phase3(old, new)
+        return {
+            "old_accuracy": old.accuracy,
+            "new_accuracy": new.accuracy,
+            "old_f1": old.f1,
+            "new_f1": new.f1,
+            "train_count": new.train_count,
+            "improved": new.accuracy > old.accuracy
+        }
+
+    def retrain_async(self, tolerance: float = None) -> bool:
+        """
+        Retrain Phase 3 in a separate process without blocking analyze().
+        Both models are scored on the new model's held-out rows (holdout_split
+        keeps those rows out of the old model's training data too); the new
+        model replaces the current one only if its F1 there is no more than
+        `tolerance` points below the current model's. (An incremental model
+        learns every feedback row online, held-out ones included, so in that
+        mode the current model is scored slightly favourably.) Returns False
+        if a retrain is already running; poll retrain_status() for progress.
+        """
+        tolerance = self.retrain_tolerance if tolerance is None else tolerance
+        with self._retrain_lock:
+            if self._retrain_status["state"] == "running":
+                return False
+            self._retrain_status = {
+                "state": "running",
+                "started_at": datetime.now().isoformat(),
+                "tolerance": tolerance,
+            }
+        self._retrain_thread = threading.Thread(target=self._background_retrain, args=(tolerance,),
+                                                name="guardian-retrain", daemon=True)
+        self._retrain_thread.start()
+        return True
+
+    def retrain_status(self) -> dict:
+        """State (idle/running/swapped/rejected/failed), timing and old/new metrics of the last retrain."""
+        with self._retrain_lock:
+            return dict(self._retrain_status)
+
+    def _background_retrain(self, tolerance: float):
+        start = time.time()
+        old = self.phase3
+        status = {}
+        try:
+            # The worker opens its own store connection; commit our buffered labels first
+            get_feedback_store().flush()
+            # spawn (not fork): the parent may hold torch/BLAS threads
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                new = executor.submit(_build_phase3, self.ml_mode).result()
+            # Same rows for both: the reported F1s come from different splits (feedback moves them)
+            holdout, new.holdout = new.holdout, None
+            old_scores, new_scores = old.evaluate(*holdout), new.evaluate(*holdout)
+            accepted = new_scores["f1"] >= old_scores["f1"] - tolerance
+            if accepted:
+                self._swap_phase3(old, new)
+            status = {
+                "state": "swapped" if accepted else "rejected",
+                "holdout_rows": len(holdout[0]),
+                "old": {**_phase3_metrics(old), "holdout": old_scores},
+                "new": {**_phase3_metrics(new), "holdout": new_scores},
+            }
+            print(f"[Phase3] Background retrain {status['state']}: F1 on {len(holdout[0])} held-out rows "
+                  f"{old_scores['f1']}% → {new_scores['f1']}%")
+        except Exception as e:
+            status = {"state": "failed", "error": repr(e)}
+            print(f"[Phase3] Background retrain failed: {e}")
+        with self._retrain_lock:
+            self._retrain_status.update(status)
+            self._retrain_status["finished_at"] = datetime.now().isoformat()
+            self._retrain_status["duration_s"] = round(time.time() - start, 2)
+
+    def _swap_phase3(self, old: Phase3ML, new: Phase3ML):
+        new.store = old.store
+        if isinstance(new, Phase3Incremental):
+            # Rows stored since the new model read its data would otherwise wait for the next batch
+            new.flush()
+        new._save_artifact()
+        self.phase3 = new
+        # Old entries can no longer hit (the key has the model version); free their memory
+        if self.verdict_cache is not None:
+            self.verdict_cache.clear()
+
+    def add_feedback(self, text: str, label: int, source: str = "human"):
+        """Store a labeled prompt; an incremental Phase 3 also learns it in its next batch."""
+        save_feedback(text, label, source)
+        # A Phase 3 that isn't loaded yet catches up from its watermark when it loads
+        phase3 = self._engines.get("phase3")
+        if isinstance(phase3, Phase3Incremental):
+            phase3.notify_feedback()
+
+    # ── Fingerprints ──────────────────────────────────────────────────────────
+    def add_fingerprints(self, texts: list, threshold: float = None) -> dict:
+        """Add attack fingerprints to the running Phase 2 (embedding only new, non-duplicate texts)."""
+        kwargs = {} if threshold is None else {"threshold": threshold}
+        report = self.phase2.add_fingerprints(texts, **kwargs)
+        self._fingerprints_changed(len(report["added"]))
+        return report
+
+    def retire_fingerprints(self, ids: list) -> list:
+        retired = self.phase2.retire_fingerprints(ids)
+        self._fingerprints_changed(len(retired))
+        return retired
+
+    def sync_fingerprints(self) -> int:
+        """Apply fingerprint changes other processes (e.g. fingerprints.py) appended to the log."""
+        changed = self.phase2.sync()
+        self._fingerprints_changed(changed)
+        return changed
+
+    def _fingerprints_changed(self, changed: int):
+        # The Phase 2 version moved, so old verdict-cache entries can no longer hit
+        if changed and self.verdict_cache is not None:
+            self.verdict_cache.clear()
+
+    # ── Hot reload ────────────────────────────────────────────────────────────
+    def reload(self, force: bool = False, retry_failed: bool = True) -> dict:
+        """
+        Rebuild Phase 1 from rules.json and Phase 2 from attacks.txt if either
+        changed since it was loaded (or always, with force), validate the new
+        engine and swap it in. Calls already running finish on the old engines;
+        an engine that fails validation is rejected and the old one keeps serving.
+        Fingerprints added or retired through fingerprints.log since the last call
+        are then applied to the live Phase 2 (sync_fingerprints()).
+        With retry_failed, phases whose initial load failed are loaded again in the
+        background, ignoring load_retry_backoff.
+        Returns {phase: status} for the phases that were looked at.
+        """
+        report = {}
+        failed = [name for name, state in self._load_state.items() if state["state"] == "failed"]
+        if retry_failed and failed:
+            for name in failed:
+                report[name] = {"state": "retrying", "error": self._load_state[name]["error"]}
+            self.warmup(retry=True)
+        with self._reload_lock:
+            for name, path in RELOAD_SOURCES.items():
+                old = self._engines.get(name)
+                if old is None:
+                    continue        # not loaded yet; it will read the current file when it loads
+                stamp = _file_stamp(path)
+                if not force and stamp == self._reload_stamps.get(name):
+                    continue
+                start = time.perf_counter()
+                try:
+                    new = Phase1Rules(store=self.store) if name == "phase1" else old.reload()
+                    self._validate_engine(name, new)
+                except Exception as e:
+                    # Remember the stamp so a broken file is reported once, not on every poll
+                    self._reload_stamps[name] = stamp
+                    report[name] = {"state": "rejected", "source": path, "error": repr(e)}
+                    print(f"[Guardian] Reload of {path} rejected: {e}")
+                    continue
+                self._reload_stamps[name] = stamp
+                status = {"state": "unchanged" if new.version == old.version else "swapped",
+                          "source": path, "old_version": old.version, "new_version": new.version,
+                          "duration_s": round(time.perf_counter() - start, 3)}
+                if status["state"] == "swapped":
+                    if name == "phase2":
+                        new.sync()      # fingerprints added to the old engine while this one was built
+                        status["new_version"] = new.version
+                    self._engines[name] = new
+                    if self.verdict_cache is not None:
+                        self.verdict_cache.clear()
+                    metrics.inc("guardian_reloads_total", phase=name)
+                    print(f"[Guardian] Reloaded {path}: {old.version} → {new.version} "
+                          f"in {status['duration_s']}s")
+                report[name] = status
+            # fingerprints.py add/retire only append to the log; the live engine applies them here
+            phase2 = self._engines.get("phase2")
+            changed = phase2.sync() if phase2 is not None else 0
+            if changed:
+                self._fingerprints_changed(changed)
+                metrics.inc("guardian_reloads_total", phase="fingerprints")
+                print(f"[Guardian] Applied {changed} fingerprint changes from {phase2.log.path}.")
+                report.setdefault("phase2", {"state": "synced", "source": phase2.log.path})
+                report["phase2"].update(fingerprint_changes=changed, new_version=phase2.version)
+            if report:
+                self._reload_status = {"state": "done", "finished_at": datetime.now().isoformat(),
+                                       "phases": report}
+        return report
+
+    def _validate_engine(self, name: str, engine):
+        """Raise unless a freshly built engine scores the probe prompts sanely."""
+        if name == "phase1":
+            # Phase1Rules validated rules.json itself before compiling it
+            outputs = [engine.analyze(p) for p in PROBES]
+        else:
+            if not len(engine.index):
+                raise ValueError("no attack fingerprints")
+            outputs = engine.analyze_batch(PROBES)
+        for out in outputs:
+            if not 0.0 <= out["score"] <= 1.0:
+                raise ValueError(f"probe score {out['score']} outside [0, 1]")
+
+    def reload_status(self) -> dict:
+        """Outcome of the last reload that found a change."""
+        return dict(self._reload_status)
+
+    def watch(self, interval: float = 2.0) -> threading.Thread:
+        """Poll rules.json, attacks.txt and fingerprints.log every `interval` seconds and reload on change."""
+        self._watch_interval = interval
+        if self._watcher is None or not self._watcher.is_alive():
+            self._watch_stop.clear()
+            self._watcher = threading.Thread(target=self._watch, args=(interval,),
+                                             name="guardian-reload", daemon=True)
+            self._watcher.start()
+        return self._watcher
+
+    def stop_watching(self):
+        self._watch_stop.set()
+
+    def _watch(self, interval: float):
+        while not self._watch_stop.wait(interval):
+            try:
+                self.reload(retry_failed=False)     # failed loads wait for their backoff
+            except Exception as e:
+                print(f"[Guardian] Reload check failed: {e}")
+
+    # ── Forking ───────────────────────────────────────────────────────────────
+    def prepare_fork(self):
+        """
+        Make this process safe to fork() with everything loaded. Every phase is loaded,
+        then every background thread is stopped or drained: warmup, reload watcher,
+        background retrain, the parallel-phase pool and the feedback store's commit
+        timer. A thread alive at fork time could hold a lock (caches, metrics, SQLite)
+        that the children would inherit locked forever. torch is limited to one
+        intra-op thread, because its thread pool doesn't survive fork either.
+        Returns the reload-watcher interval, or None; the caller restarts the watcher
+        (watch()) in the children.
+        """
+        self.warmup(background=False, retry=True)
+        interval = self._watch_interval
+        self.stop_watching()
+        for thread in (self._warmup_thread, self._watcher, self._retrain_thread):
+            if thread is not None:
+                thread.join()
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+        close_feedback_store()
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            torch.set_num_threads(1)
+        return interval
 
 
 if __name__ == "__main__":
@@ -0,0 +1,297 @@
+"""
+metrics.py — Low-overhead instrumentation for LLM Guardian
+
+Stage timers, counters and latency histograms kept in one process-wide
+registry. Export with prometheus_text() (Prometheus text exposition format,
+served by server.py at GET /metrics) or snapshot() (plain dict, for logs and
+tests). SlowRequestProfiler optionally runs cProfile on a sample of requests
+and keeps the profile of those slower than a threshold.
+
+Usage:
+    import metrics
+    with metrics.stage("phase2.embed"):
+        ...
+    metrics.inc("guardian_verdicts_total", verdict="BLOCK")
+    print(metrics.prometheus_text())
+"""
+
+import bisect
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+from collections import deque
+
+# Seconds; spans cache hits (~µs) to long-prompt embedding (seconds)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DESCRIPTIONS = {
+    "guardian_stage_duration_seconds": ("histogram", "Time spent in each pipeline stage per call"),
+    "guardian_request_duration_seconds": ("histogram", "analyze_batch latency per prompt"),
+    "guardian_prompts_total": ("counter", "Prompts analyzed"),
+    "guardian_verdicts_total": ("counter", "Verdicts returned, by verdict"),
+    "guardian_rule_matches_total": ("counter", "Phase 1 rule matches, by rule name"),
+    "guardian_verdict_cache_hits_total": ("counter", "Prompts answered from the verdict cache"),
+    "guardian_near_duplicate_hits_total": ("counter", "Prompts that reused a near-duplicate's Phase 2 result"),
+    "guardian_reloads_total": ("counter", "Hot reloads of rules.json/attacks.txt swapped in, and fingerprints.log syncs"),
+    "guardian_degraded_verdicts_total": ("counter", "Verdicts given before Phase 2/3 finished loading"),
+    "guardian_phase_timeouts_total": ("counter", "Parallel-mode phases that missed phase_timeout"),
+    "guardian_phase_saturated_total": ("counter", "Parallel-mode phases not started: an abandoned run was still executing"),
+    "guardian_slow_requests_total": ("counter", "Profiled requests slower than the profiler threshold"),
+    "guardian_sessions_truncated_total": ("counter", "Scan sessions dropped for outgrowing the session memory cap"),
+}
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)    # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float, n: int = 1) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += n
+        self.sum += value * n
+        self.count += n
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (None if empty)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Registry:
+    def __init__(self):
+        self.enabled = True
+        self.counters = {}      # (name, labels) → value
+        self.histograms = {}    # (name, labels) → Histogram
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, n: int = 1, **labels) -> None:
+        """Record value (n times, e.g. once per prompt of a batch sharing one latency)."""
+        if self.enabled:
+            self.observe_key((name, tuple(sorted(labels.items()))), value, n)
+
+    def observe_key(self, key: tuple, value: float, n: int = 1) -> None:
+        """observe() with a prebuilt (name, sorted label items) key, for hot paths."""
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value, n)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self) -> dict:
+        """Counters and histogram summaries (count, mean and bucketed p50/p95/p99 in ms)."""
+        with self._lock:
+            counters = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                counters.setdefault(name, {})[_label_str(labels) or "total"] = value
+            histograms = {}
+            for (name, labels), h in sorted(self.histograms.items()):
+                histograms.setdefault(name, {})[_label_str(labels) or "all"] = {
+                    "count": h.count,
+                    "mean_ms": round(h.sum / h.count * 1000, 3) if h.count else None,
+                    "p50_ms": _ms(h.quantile(0.50)),
+                    "p95_ms": _ms(h.quantile(0.95)),
+                    "p99_ms": _ms(h.quantile(0.99)),
+                }
+        return {"counters": counters, "histograms": histograms}
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (list(h.counts), h.sum, h.count, h.buckets))
+                                for key, h in self.histograms.items())
+        lines = []
+        described = set()
+
+        def header(name):
+            if name not in described:
+                described.add(name)
+                kind, text = DESCRIPTIONS.get(name, ("untyped", name))
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f"{name}{_prom_labels(labels)} {value}")
+        for (name, labels), (counts, total, count, buckets) in histograms:
+            header(name)
+            cumulative = 0
+            for bound, n in zip(buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_prom_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_prom_labels(labels)} {total}")
+            lines.append(f"{name}_count{_prom_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _ms(seconds):
+    if seconds is None or seconds == float("inf"):
+        return seconds
+    return round(seconds * 1000, 3)
+
+
+def _label_str(labels: tuple) -> str:
+    return ",".join(f"{k}={v}" for k, v in labels)
+
+
+def _prom_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+REGISTRY = Registry()
+
+
+# ─────────────────────────────────────────────
+# Module-level API over the default registry
+# ─────────────────────────────────────────────
+_STAGE_KEYS = {}
+
+
+class _Stage:
+    __slots__ = ("key", "start")
+
+    def __init__(self, name: str):
+        key = _STAGE_KEYS.get(name)
+        if key is None:
+            key = _STAGE_KEYS[name] = ("guardian_stage_duration_seconds", (("stage", name),))
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if REGISTRY.enabled:
+            REGISTRY.observe_key(self.key, time.perf_counter() - self.start)
+
+
+def stage(name: str) -> _Stage:
+    """Context manager timing one pipeline stage into the stage-duration histogram."""
+    return _Stage(name)
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, n: int = 1, **labels) -> None:
+    REGISTRY.observe(name, value, n, **labels)
+
+
+def snapshot() -> dict:
+    return REGISTRY.snapshot()
+
+
+def prometheus_text() -> str:
+    return REGISTRY.prometheus_text()
+
+
+def enable(on: bool = True) -> None:
+    REGISTRY.enabled = on
+
+
+def reset() -> None:
+    REGISTRY.reset()
+
+
+# ─────────────────────────────────────────────
+# Sampling profiler for slow requests
+# ─────────────────────────────────────────────
+class SlowRequestProfiler:
+    """
+    Profiles a random sample of requests with cProfile and keeps the report of
+    any that took longer than threshold_ms. Only one request is profiled at a
+    time, and only the calling thread (parallel-mode phase threads are not
+    included).
+    """
+
+    def __init__(self, threshold_ms: float = 250.0, sample_rate: float = 0.01, keep: int = 20,
+                 top: int = 25, callback=None):
+        """
+        sample_rate — fraction of requests profiled (profiling roughly doubles their cost)
+        keep        — number of slow-request reports retained
+        top         — functions listed per report, by cumulative time
+        callback    — optional fn(report) called for every slow request
+        """
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.top = top
+        self.callback = callback
+        self.reports = deque(maxlen=keep)
+        self._busy = threading.Lock()
+
+    def profile(self, label: str = ""):
+        return _ProfiledCall(self, label)
+
+    def _finish(self, profiler: cProfile.Profile, label: str, elapsed_ms: float) -> None:
+        if elapsed_ms < self.threshold_ms:
+            return
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(self.top)
+        report = {
+            "label": label,
+            "latency_ms": round(elapsed_ms, 1),
+            "at": time.time(),
+            "profile": out.getvalue(),
+        }
+        self.reports.append(report)
+        REGISTRY.inc("guardian_slow_requests_total")
+        if self.callback:
+            self.callback(report)
+
+
+class _ProfiledCall:
+    def __init__(self, owner: SlowRequestProfiler, label: str):
+        self.owner = owner
+        self.label = label
+        self.profiler = None
+
+    def __enter__(self):
+        owner = self.owner
+        if random.random() < owner.sample_rate and owner._busy.acquire(blocking=False):
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:      # another profiler is active in this process
+                self.profiler = None
+                owner._busy.release()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler is None:
+            return
+        elapsed_ms = (time.perf_counter() - self.start) * 1000
+        self.profiler.disable()
+        try:
+            self.owner._finish(self.profiler, self.label, elapsed_ms)
+        finally:
+            self.owner._busy.release()
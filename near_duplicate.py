@@ -0,0 +1,153 @@
+"""
+near_duplicate.py — MinHash/LSH index of recently scored prompts
+
+Templated traffic and attack campaigns repeat prompts that differ only in a
+name, a number or whitespace. The exact-match verdict cache misses these;
+this index finds them. Each cleaned prompt is reduced to its set of word
+bigrams ("shingles"), hashed into a MinHash signature, and the signature is
+split into bands for locality-sensitive hashing: prompts sharing any band
+are candidates, and a candidate counts as a near-duplicate only if the exact
+Jaccard similarity of the shingle sets reaches the threshold.
+
+With 16 bands of 4 rows a pair at Jaccard 0.8 becomes a candidate with
+probability 1 − (1 − 0.8⁴)¹⁶ ≈ 0.9998; at 0.3 only ≈ 0.12, so few exact
+comparisons are wasted. The index is bounded (LRU) and emptied whenever the
+model versions it was filled under change.
+"""
+
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+_PRIME = (1 << 31) - 1      # a·h + b stays below 2⁶³ for 32-bit shingle hashes
+
+
+class NearDuplicateIndex:
+    def __init__(self, maxsize: int = 10_000, threshold: float = 0.8, num_perm: int = 64,
+                 bands: int = 16, shingle_size: int = 2, min_shingles: int = 4, seed: int = 1):
+        """
+        maxsize      — prompts remembered; least recently matched/added are evicted first
+        threshold    — minimum Jaccard similarity of shingle sets to reuse a verdict
+        num_perm     — MinHash permutations, split into `bands` LSH bands
+        shingle_size — words per shingle
+        min_shingles — shorter prompts are never matched (too little evidence)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_shingles = min_shingles
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _PRIME, size=(num_perm, 1)).astype(np.uint64)
+        self._b = rng.randint(0, _PRIME, size=(num_perm, 1)).astype(np.uint64)
+        self.version = None
+        self._entries = OrderedDict()                   # id → (shingles, band keys, payload)
+        self._buckets = [{} for _ in range(bands)]      # band key → set of ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.comparisons = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ── Hashing ───────────────────────────────────────────────────────────────
+    def shingles(self, text: str) -> np.ndarray:
+        """Sorted unique 32-bit hashes of the word n-grams of a text."""
+        words = text.lower().split()
+        k = self.shingle_size
+        grams = [" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))] if words else []
+        return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams),
+                                     dtype=np.uint64, count=len(grams)))
+
+    def _band_keys(self, shingles: np.ndarray) -> list:
+        signature = ((self._a * shingles[None, :] + self._b) % _PRIME).min(axis=1)
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.bands)]
+
+    def probe(self, text: str):
+        """Precomputed (shingles, band keys) of a text, or None if it is too short to match."""
+        shingles = self.shingles(text)
+        if len(shingles) < self.min_shingles:
+            return None
+        return shingles, self._band_keys(shingles)
+
+    # ── Lookup / insert ───────────────────────────────────────────────────────
+    def lookup(self, probe, version: str):
+        """(payload, jaccard) of the most similar remembered prompt at or above threshold, else None."""
+        if probe is None:
+            return None
+        shingles, keys = probe
+        with self._lock:
+            if version != self.version:
+                self._reset(version)
+            candidates = set()
+            for band, key in keys:
+                candidates.update(self._buckets[band].get(key, ()))
+            best, best_id = 0.0, None
+            for entry_id in candidates:
+                other = self._entries[entry_id][0]
+                self.comparisons += 1
+                shared = np.intersect1d(shingles, other, assume_unique=True).size
+                jaccard = shared / (len(shingles) + len(other) - shared)
+                if jaccard > best:
+                    best, best_id = jaccard, entry_id
+            if best_id is None or best < self.threshold:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id][2], round(best, 4)
+
+    def add(self, probe, payload, version: str) -> None:
+        if probe is None or self.maxsize == 0:
+            return
+        shingles, keys = probe
+        with self._lock:
+            if version != self.version:
+                self._reset(version)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (shingles, keys, payload)
+            for band, key in keys:
+                self._buckets[band].setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.maxsize:
+                old_id, (_, old_keys, _) = self._entries.popitem(last=False)
+                for band, key in old_keys:
+                    bucket = self._buckets[band].get(key)
+                    bucket.discard(old_id)
+                    if not bucket:
+                        del self._buckets[band][key]
+                self.evictions += 1
+
+    def _reset(self, version: str) -> None:
+        self._entries.clear()
+        for bucket in self._buckets:
+            bucket.clear()
+        self.version = version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset(self.version)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "comparisons": self.comparisons,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
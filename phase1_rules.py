@@ -1,23 +1,215 @@
+import hashlib
 import json
+import platform
 import re
+import time
 
-def load_rules(path="rules.json"):
+from artifacts import file_hash, hash_sources
+
+try:
+    from re import _parser as sre_parse, _casefix
+except ImportError:   # Python < 3.11
+    import sre_parse
+    _casefix = None
+
+def _build_fold_table() -> dict:
+    """
+    Characters IGNORECASE treats as equal beyond str.lower() (e.g. 'ſ' ~ 's'),
+    folded to one representative so substring checks agree with the regex engine.
+    """
+    table = {}
+    for lo, alts in (getattr(_casefix, "_EXTRA_CASES", None) or {}).items():
+        group = (lo,) + alts
+        for c in group:
+            if c != min(group):
+                table[c] = min(group)
+    return table
+
+
+_FOLD = _build_fold_table()
+
+
+def _fold(text: str) -> str:
+    return text.translate(_FOLD)
+
+
+RULES_FILE = "rules.json"
+
+
+def load_rules(path=RULES_FILE):
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
+
+def validate_rules(rules) -> None:
+    """Raise ValueError unless every rule has a unique name, a string pattern and a risk in [0, 1]."""
+    if not isinstance(rules, list) or not rules:
+        raise ValueError("rules must be a non-empty list")
+    names = set()
+    for i, rule in enumerate(rules):
+        if not isinstance(rule, dict) or not isinstance(rule.get("name"), str) \
+                or not isinstance(rule.get("pattern"), str):
+            raise ValueError(f"rule {i} needs a string 'name' and 'pattern'")
+        risk = rule.get("risk")
+        if isinstance(risk, bool) or not isinstance(risk, (int, float)) or not 0.0 <= risk <= 1.0:
+            raise ValueError(f"rule {rule['name']!r}: risk must be a number in [0, 1]")
+        if rule["name"] in names:
+            raise ValueError(f"duplicate rule name {rule['name']!r}")
+        names.add(rule["name"])
+
+
+# ─────────────────────────────────────────────
+# Literal prefilter extraction
+# ─────────────────────────────────────────────
+def _literal_char(code: int):
+    ch = chr(code).lower()
+    return _fold(ch) if len(ch) == 1 else None
+
+
+def _best_factor(factors: list):
+    """Pick the most selective any-of literal set: longest shortest literal, then fewest."""
+    factors = [f for f in factors if f and all(f)]
+    if not factors:
+        return None
+    return max(factors, key=lambda f: (min(len(lit) for lit in f), -len(f)))
+
+
+def _required_literals(items) -> frozenset:
+    """
+    For a parsed regex sequence, return a set of literals of which at least one
+    must appear in any matching text, or None if no such set can be proven.
+    """
+    factors = []
+    run = []
+
+    def flush():
+        if run:
+            factors.append(frozenset(["".join(run)]))
+            run.clear()
+
+    for op, arg in items:
+        name = str(op)
+        if name == "LITERAL":
+            ch = _literal_char(arg)
+            if ch is None:
+                flush()
+            else:
+                run.append(ch)
+            continue
+        flush()
+        if name == "SUBPATTERN":
+            factors.append(_required_literals(arg[-1]))
+        elif name == "BRANCH":
+            alternatives = [_required_literals(branch) for branch in arg[1]]
+            if all(alternatives):
+                factors.append(frozenset().union(*alternatives))
+        elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT") and arg[0] >= 1:
+            factors.append(_required_literals(arg[2]))
+        elif name == "ATOMIC_GROUP":
+            factors.append(_required_literals(arg))
+    flush()
+    return _best_factor(factors)
+
+
+def _backtracking_risk(items, depth: int = 0) -> list:
+    """Static hints for super-linear patterns: nested or chained unbounded repeats."""
+    risks = []
+    unbounded_in_seq = 0
+    for op, arg in items:
+        name = str(op)
+        if name in ("MAX_REPEAT", "MIN_REPEAT"):
+            lo, hi, body = arg
+            if hi == sre_parse.MAXREPEAT:
+                unbounded_in_seq += 1
+                if depth > 0:
+                    risks.append("nested unbounded repeat")
+            risks.extend(_backtracking_risk(body, depth + (hi == sre_parse.MAXREPEAT)))
+        elif name == "SUBPATTERN":
+            risks.extend(_backtracking_risk(arg[-1], depth))
+        elif name == "BRANCH":
+            for branch in arg[1]:
+                risks.extend(_backtracking_risk(branch, depth))
+    if unbounded_in_seq >= 2:
+        risks.append(f"{unbounded_in_seq} chained unbounded repeats")
+    return risks
+
+
+# ─────────────────────────────────────────────
+# Compiled rule set
+# ─────────────────────────────────────────────
+class RuleSet:
+    """
+    Rules compiled once at load time. Each rule gets a literal prefilter; only
+    rules whose required substrings occur in the prompt run their regex.
+    """
+    # Bump when the pickled layout changes; prefilter logic is covered by the code hash
+    FORMAT = 1
+
+    def __init__(self, rules: list):
+        self.rules = rules
+        self.compiled = [re.compile(rule["pattern"], re.IGNORECASE) for rule in rules]
+        self.prefilters = []
+        self.always = []          # rule indices with no extractable literal
+        self.by_literal = {}      # literal → rule indices that require it
+        for i, rule in enumerate(rules):
+            literals = _required_literals(sre_parse.parse(rule["pattern"], re.IGNORECASE))
+            self.prefilters.append(literals)
+            if literals is None:
+                self.always.append(i)
+            else:
+                for lit in literals:
+                    self.by_literal.setdefault(lit, []).append(i)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def candidates(self, text: str) -> list:
+        folded = _fold(text)
+        hit = set(self.always)
+        for lit, indices in self.by_literal.items():
+            if lit in folded:
+                hit.update(indices)
+        return sorted(hit)
+
+    def match(self, text: str) -> list:
+        """Indices of matching rules, in rules.json order."""
+        return [i for i in self.candidates(text) if self.compiled[i].search(text)]
+
+
 class Phase1Rules:
-    def __init__(self):
-        self.rules = load_rules()
+    ARTIFACT = "phase1_rules"
+
+    def __init__(self, store=None):
+        # A pickled RuleSet embeds prefilters derived by this module's code (and the
+        # Python version's case-folding table), so both are part of the key
+        key = {"sources": [RULES_FILE],
+               "extra": {"format": RuleSet.FORMAT, "code": file_hash(__file__),
+                         "python": platform.python_version()}}
+        hashes = hash_sources(key["sources"])
+        self.ruleset = store.load(self.ARTIFACT, hashes=hashes, **key) if store else None
+        if self.ruleset is None:
+            rules = load_rules()
+            # Before compiling or caching, so startup and hot reload reject the same files
+            validate_rules(rules)
+            self.ruleset = RuleSet(rules)
+            if store:
+                store.save(self.ARTIFACT, self.ruleset, hashes=hashes, **key)
+        self.rules = self.ruleset.rules
+        # Content hash of the loaded rules; part of the verdict-cache key
+        self.version = hashlib.sha256(json.dumps(self.rules, sort_keys=True).encode("utf-8")).hexdigest()[:12]
 
     def analyze(self, prompt: str) -> dict:
-        prompt_lower = prompt.lower()
+        return self.score(self.ruleset.match(prompt.lower()))
+
+    def score(self, indices) -> dict:
+        """Result for a set of matched rule indices (sessions accumulate them across chunks)."""
         matches = []
         total_risk = 0.0
 
-        for rule in self.rules:
-            if re.search(rule["pattern"], prompt_lower, re.IGNORECASE):
-                matches.append(rule["name"])
-                total_risk += rule["risk"]
+        for i in sorted(indices):
+            rule = self.rules[i]
+            matches.append(rule["name"])
+            total_risk += rule["risk"]
 
         # Use highest-risk match, boosted slightly for each additional match
         score = min(1.0, total_risk * (1 + 0.15 * (len(matches) - 1))) if matches else 0.0
@@ -28,6 +220,51 @@ class Phase1Rules:
             "explanation": f"{len(matches)} rule(s) matched: {', '.join(matches)}" if matches else "No patterns matched"
         }
 
+    def timing_report(self, prompts: list, probe_repeats: int = 200) -> list:
+        """
+        Per-rule cost over the given prompts, slowest first. Each rule is also
+        run against a synthetic worst case (its own literals repeated with no
+        match) to expose patterns that may backtrack catastrophically.
+        """
+        ruleset = self.ruleset
+        lowered = [p.lower() for p in prompts]
+        report = []
+        for i, rule in enumerate(self.rules):
+            regex = ruleset.compiled[i]
+            literals = ruleset.prefilters[i]
+
+            start = time.perf_counter()
+            for text in lowered:
+                regex.search(text)
+            total = time.perf_counter() - start
+
+            passed = sum(1 for text in lowered if literals is None or any(l in _fold(text) for l in literals))
+
+            probe_unit = (" ".join(sorted(literals)) if literals else "a b c d") + " "
+            probe_times = []
+            for n in (probe_repeats // 2, probe_repeats):
+                probe = probe_unit * n
+                start = time.perf_counter()
+                regex.search(probe)
+                probe_times.append(time.perf_counter() - start)
+            growth = probe_times[1] / probe_times[0] if probe_times[0] > 0 else 0.0
+
+            report.append({
+                "name": rule["name"],
+                "pattern": rule["pattern"],
+                "total_ms": round(total * 1000, 3),
+                "mean_us": round(total / max(1, len(lowered)) * 1e6, 2),
+                "prefilter": sorted(literals) if literals else None,
+                "prefilter_pass_rate": round(passed / max(1, len(lowered)), 3),
+                "probe_ms": round(probe_times[1] * 1000, 3),
+                # ~2x when linear, ~4x when quadratic
+                "probe_growth": round(growth, 2),
+                "risks": sorted(set(_backtracking_risk(sre_parse.parse(rule["pattern"], re.IGNORECASE))))
+                         + (["super-linear on probe"] if growth > 3.0 else []),
+            })
+        report.sort(key=lambda r: r["total_ms"] + r["probe_ms"], reverse=True)
+        return report
+
 
 if __name__ == "__main__":
     engine = Phase1Rules()
@@ -1,51 +1,323 @@
+import copy
+import hashlib
 import re
-import chromadb
-from chromadb.utils import embedding_functions
+import threading
+import numpy as np
+
+import metrics
+from cache import LRUCache
+from artifacts import hash_sources
+from fingerprints import (FINGERPRINT_LOG, DEDUPE_THRESHOLD, FingerprintLog, fingerprint_id,
+                          encode_vector, decode_vector)
+from semantic_index import make_index
 
 ATTACKS_FILE = "attacks.txt"
-COLLECTION_NAME = "jailbreak_signatures"
+MODEL_NAME = "all-MiniLM-L6-v2"
+MAX_SUBPHRASES = 5
 
 class Phase2Semantic:
-    def __init__(self):
-        self.embedding_func = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
-        )
-        # EphemeralClient = pure in-memory, no filesystem writes needed
-        # Works correctly with chromadb 0.5.x (Python SQLite backend)
-        self.client = chromadb.EphemeralClient()
-        self.collection = self.client.create_collection(
-            name=COLLECTION_NAME,
-            embedding_function=self.embedding_func,
-            metadata={"hnsw:space": "cosine"}
-        )
+    ARTIFACT = "phase2_fingerprints"
+
+    def __init__(self, backend: str = "numpy", cache_size: int = 4096, cache_ttl: float = None,
+                 store=None, long_prompt_mode: bool = False, window_tokens: int = 48,
+                 window_stride: int = 24, max_units: int = None, embed_batch_size: int = 64,
+                 log_path: str = FINGERPRINT_LOG):
+        """
+        long_prompt_mode — scan every subphrase plus overlapping word windows instead of
+                           only the first MAX_SUBPHRASES subphrases
+        window_tokens / window_stride — window size and step, in whitespace tokens
+        max_units        — optional cap on texts embedded per prompt; when exceeded, units
+                           are sampled evenly across the prompt and coverage drops below 1.0
+        log_path         — append-only log of fingerprints added/retired since attacks.txt
+                           (replayed on load; None disables incremental ingestion)
+        """
+        self.long_prompt_mode = long_prompt_mode
+        self.window_tokens = window_tokens
+        self.window_stride = window_stride
+        self.max_units = max_units
+        self.embed_batch_size = embed_batch_size
+        # Imported here: sentence-transformers pulls in torch, seconds of import time
+        from sentence_transformers import SentenceTransformer
+        self.encoder = SentenceTransformer(MODEL_NAME)
+        self.index = make_index(backend)
+        # Subphrase embeddings keyed by normalized text (cache_size=0 disables)
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+        self.store = store
+        self.log = FingerprintLog(log_path) if log_path else None
+        # Serializes index searches with adds/retirements from other threads
+        self._lock = threading.RLock()
         self._load_attacks()
 
-    def _load_attacks(self):
-        with open(ATTACKS_FILE, "r", encoding="utf-8") as f:
-            attacks = [line.strip() for line in f if line.strip()]
-        ids = [f"attack_{i}" for i in range(len(attacks))]
-        self.collection.add(documents=attacks, ids=ids)
-        print(f"[Phase2] Loaded {len(attacks)} attack fingerprints into ChromaDB.")
+    def _embed(self, texts: list) -> np.ndarray:
+        return np.asarray(
+            self.encoder.encode(texts, batch_size=self.embed_batch_size, convert_to_numpy=True),
+            dtype=np.float32
+        )
 
-    def analyze(self, prompt: str) -> dict:
+    @staticmethod
+    def _cache_key(text: str) -> str:
+        # MiniLM's tokenizer is uncased and whitespace-insensitive, so this
+        # normalization never changes the embedding
+        return " ".join(text.split()).lower()
+
+    def _embed_cached(self, texts: list) -> np.ndarray:
+        """Embed texts, only running the encoder on phrases not already cached."""
+        keys = [self._cache_key(t) for t in texts]
+        vectors = [self.cache.get(k) for k in keys]
+        missing = list(dict.fromkeys(k for k, v in zip(keys, vectors) if v is None))
+        if missing:
+            fresh = {k: v.copy() for k, v in zip(missing, self._embed(missing))}
+            for k in missing:
+                self.cache.put(k, fresh[k])
+            vectors = [fresh[k] if v is None else v for k, v in zip(keys, vectors)]
+        return np.stack(vectors)
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats()
+
+    def _load_attacks(self, previous: "Phase2Semantic" = None):
+        key = {"sources": [ATTACKS_FILE], "extra": {"model": MODEL_NAME, "ids": "content"}}
+        hashes = hash_sources(key["sources"])
+        state = self.store.load(self.ARTIFACT, hashes=hashes, **key) if self.store else None
+        if state is None:
+            with open(ATTACKS_FILE, "r", encoding="utf-8") as f:
+                attacks = {fingerprint_id(line.strip()): line.strip() for line in f if line.strip()}
+            # On reload, lines the previous engine already embedded keep their vectors, read back
+            # from its index (nothing is kept in RAM for this between reloads)
+            if previous:
+                with previous._lock:
+                    known = previous.index.embeddings(list(attacks))
+            else:
+                known = {}
+            new = [text for fid, text in attacks.items() if fid not in known]
+            fresh = iter(self._embed(new)) if known and new else iter(())
+            state = {
+                "ids": list(attacks),
+                "documents": list(attacks.values()),
+                "embeddings": (np.stack([known[fid] if fid in known else next(fresh) for fid in attacks])
+                               if known else self._embed(new)),
+            }
+            if previous:
+                print(f"[Phase2] Embedded {len(new)} new of {len(attacks)} attack fingerprints.")
+            if self.store:
+                self.store.save(self.ARTIFACT, state, hashes=hashes, **key)
+        self.index.add(state["ids"], state["documents"], state["embeddings"])
+        self.live_ids = set(state["ids"])
+        # Fingerprints, model and scan settings all change scores; part of the verdict-cache key.
+        # Every applied add/retire is chained into the digest, so a replayed log gives the same version
+        config = f"{MODEL_NAME}|{self.long_prompt_mode}|{self.window_tokens}|{self.window_stride}|{self.max_units}"
+        self._digest = hashlib.sha256("\n".join([config] + list(state["documents"])).encode("utf-8"))
+        self.version = self._digest.hexdigest()[:12]
+        print(f"[Phase2] Loaded {len(state['ids'])} attack fingerprints into {self.index.name} index.")
+        replayed = self.sync()
+        if replayed:
+            print(f"[Phase2] Replayed {replayed} fingerprint changes from {self.log.path}.")
+
+    def reload(self) -> "Phase2Semantic":
+        """
+        A new engine for the current attacks.txt plus the fingerprint log, sharing
+        this one's encoder and embedding cache. Only lines this engine hasn't
+        embedded are encoded; this engine keeps serving until the caller swaps.
+        """
+        engine = copy.copy(self)
+        engine.index = make_index(self.index.name)
+        engine.log = FingerprintLog(self.log.path) if self.log else None
+        engine._lock = threading.RLock()
+        engine._load_attacks(previous=self)
+        return engine
+
+    # ── Incremental fingerprints ──────────────────────────────────────────────
+    def _apply(self, records: list) -> int:
+        """Apply add/retire records to the index (idempotent); returns the number that changed it."""
+        adds = {}
+        changed = 0
+        with self._lock:
+            for record in records + [None]:
+                # Consecutive adds go to the index as one block
+                if record is not None and record.get("op") == "add":
+                    if record["id"] not in self.live_ids and record["id"] not in adds:
+                        adds[record["id"]] = record
+                    continue
+                if adds:
+                    self._add_records(list(adds.values()))
+                    changed += len(adds)
+                    adds = {}
+                if record is not None and record.get("op") == "retire" and record["id"] in self.live_ids:
+                    self.index.remove([record["id"]])
+                    self.live_ids.discard(record["id"])
+                    self._digest.update(f"\nretire {record['id']}".encode("utf-8"))
+                    changed += 1
+            self.version = self._digest.hexdigest()[:12]
+        return changed
+
+    def _add_records(self, records: list) -> None:
+        # Embeddings from another model version can't be mixed in; re-encode those texts
+        stale = [r["text"] for r in records if r.get("model") != MODEL_NAME or "embedding" not in r]
+        fresh = iter(self._embed(stale)) if stale else iter(())
+        vectors = np.stack([
+            decode_vector(r["embedding"]) if r.get("model") == MODEL_NAME and "embedding" in r else next(fresh)
+            for r in records
+        ])
+        self.index.add([r["id"] for r in records], [r["text"] for r in records], vectors)
+        for r in records:
+            self.live_ids.add(r["id"])
+            self._digest.update(f"\nadd {r['id']}".encode("utf-8"))
+
+    def sync(self) -> int:
+        """Apply records other processes appended to the log since the last sync. No encoding needed."""
+        if self.log is None:
+            return 0
+        return self._apply(self.log.read_new())
+
+    def add_fingerprints(self, texts: list, threshold: float = DEDUPE_THRESHOLD, source: str = "api") -> dict:
+        """
+        Embed only the new texts and add those less than `threshold` cosine-similar
+        to every live fingerprint (and to each other). Returns the added ids and the
+        skipped near-duplicates.
+        """
+        if self.log is None:
+            raise RuntimeError("Incremental fingerprints need a log_path")
+        self.sync()
+        candidates = {}
+        duplicates = []
+        for text in texts:
+            text = text.strip()
+            if not text:
+                continue
+            fid = fingerprint_id(text)
+            if fid in self.live_ids or fid in candidates:
+                duplicates.append({"text": text, "matched": text, "similarity": 1.0})
+            else:
+                candidates[fid] = text
+        if not candidates:
+            return {"added": [], "duplicates": duplicates}
+
+        vectors = self._embed(list(candidates.values()))
+        with self._lock:
+            hits = self.index.search(vectors)
+        normalized = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        records = []
+        kept = []
+        for i, ((fid, text), hit) in enumerate(zip(candidates.items(), hits)):
+            if hit is not None and 1.0 - hit[0] >= threshold:
+                duplicates.append({"text": text, "matched": hit[1], "similarity": round(1.0 - hit[0], 4)})
+                continue
+            # Near-duplicates within the same batch: keep the first
+            if kept:
+                sims = normalized[kept] @ normalized[i]
+                best = int(sims.argmax())
+                if sims[best] >= threshold:
+                    duplicates.append({"text": text, "matched": records[best]["text"],
+                                       "similarity": round(float(sims[best]), 4)})
+                    continue
+            kept.append(i)
+            records.append({"op": "add", "id": fid, "text": text, "model": MODEL_NAME,
+                            "embedding": encode_vector(vectors[i]), "source": source})
+
+        # Write-ahead: the log is the source of truth, the index is rebuilt from it on restart
+        self.log.append(records)
+        self._apply(records)
+        print(f"[Phase2] Added {len(records)} fingerprints ({len(duplicates)} duplicates skipped).")
+        return {"added": [r["id"] for r in records], "duplicates": duplicates}
+
+    def retire_fingerprints(self, ids: list) -> list:
+        """Stop matching fingerprints by id (base attacks.txt ids included). Returns the ids retired."""
+        if self.log is None:
+            raise RuntimeError("Incremental fingerprints need a log_path")
+        self.sync()
+        retired = [fid for fid in dict.fromkeys(ids) if fid in self.live_ids]
+        records = [{"op": "retire", "id": fid} for fid in retired]
+        self.log.append(records)
+        self._apply(records)
+        print(f"[Phase2] Retired {len(retired)} fingerprints.")
+        return retired
+
+    def _subphrases(self, prompt: str) -> tuple:
+        """Texts to embed for a prompt, plus the number of candidate units before any budget cut."""
         subphrases = re.split(r"[.!?;,]", prompt)
-        subphrases = [p.strip() for p in subphrases if len(p.strip()) > 5][:5]
-        if not subphrases:
-            subphrases = [prompt]
+        subphrases = [p.strip() for p in subphrases if len(p.strip()) > 5]
+        tokens = prompt.split()
+        if not self.long_prompt_mode or (len(subphrases) <= MAX_SUBPHRASES
+                                         and len(tokens) <= self.window_tokens):
+            subphrases = subphrases[:MAX_SUBPHRASES] or [prompt]
+            return subphrases, len(subphrases)
+
+        units = list(dict.fromkeys(subphrases + self._windows(tokens)))
+        total = len(units)
+        if self.max_units and total > self.max_units:
+            picks = np.unique(np.linspace(0, total - 1, self.max_units).round().astype(int))
+            units = [units[i] for i in picks]
+        return units, total
+
+    def _windows(self, tokens: list) -> list:
+        """Overlapping word windows covering every token."""
+        size, stride = self.window_tokens, self.window_stride
+        if len(tokens) <= size:
+            return [" ".join(tokens)]
+        starts = list(range(0, len(tokens) - size + 1, stride))
+        if starts[-1] != len(tokens) - size:
+            starts.append(len(tokens) - size)
+        return [" ".join(tokens[i:i + size]) for i in starts]
+
+    def analyze(self, prompt: str) -> dict:
+        return self.analyze_batch([prompt])[0]
 
+    def analyze_batch(self, prompts: list) -> list:
+        """Score many prompts with a single embedding pass and one index search."""
+        selected = [self._subphrases(p) for p in prompts]
+        per_prompt = [units for units, _ in selected]
+        unique = list(dict.fromkeys(ph for phrases in per_prompt for ph in phrases))
+        if not unique:
+            return []
+
+        nearest = self._nearest(unique)
+
+        results = []
+        for units, total in selected:
+            result = self._reduce(units, nearest)
+            if self.long_prompt_mode:
+                result["scanned_units"] = len(units)
+                result["coverage"] = round(len(units) / total, 3)
+            results.append(result)
+        return results
+
+    def _nearest(self, texts: list) -> dict:
+        """text → (distance, document) of its nearest fingerprint."""
+        with metrics.stage("phase2.embed"):
+            vectors = self._embed_cached(texts)
+        with metrics.stage(f"phase2.search.{self.index.name}"), self._lock:
+            hits = self.index.search(vectors)
+        return {text: hit for text, hit in zip(texts, hits) if hit is not None}
+
+    def units(self, text: str) -> list:
+        """Every subphrase of a text, long ones split into overlapping word windows (sessions)."""
+        units = []
+        for phrase in re.split(r"[.!?;,]", text):
+            tokens = phrase.split()
+            if len(phrase.strip()) <= 5:
+                continue
+            units.extend(self._windows(tokens) if len(tokens) > self.window_tokens else [" ".join(tokens)])
+        return units or ([" ".join(text.split())] if len(text.strip()) > 5 else [])
+
+    def score_units(self, units: list) -> dict:
+        """Max similarity over already-selected texts, in the same form as analyze()."""
+        unique = list(dict.fromkeys(units))
+        return self._reduce(unique, self._nearest(unique) if unique else {})
+
+    @staticmethod
+    def _reduce(subphrases: list, nearest: dict) -> dict:
         max_similarity = 0.0
         top_match = None
 
         for phrase in subphrases:
-            results = self.collection.query(query_texts=[phrase], n_results=1)
-            if results["distances"] and results["distances"][0]:
-                distance = results["distances"][0][0]
+            if phrase in nearest:
+                distance, document = nearest[phrase]
                 similarity = max(0.0, 1.0 - distance)
                 if similarity > max_similarity:
                     max_similarity = similarity
                     top_match = {
                         "phrase": phrase[:60],
-                        "matched": results["documents"][0][0][:60] if results["documents"][0] else "",
+                        "matched": document[:60],
                         "similarity": round(similarity, 3)
                     }
 
@@ -55,7 +327,6 @@ class Phase2Semantic:
             "explanation": f"Max similarity: {max_similarity:.3f}" if top_match else "No semantic match"
         }
 
-
 if __name__ == "__main__":
     engine = Phase2Semantic()
     tests = [
@@ -18,14 +18,24 @@ HOMOGLYPH_MAP = {
     'Т': 'T', 'У': 'Y', 'Х': 'X', 'ı': 'i', 'ο': 'o', 'ρ': 'p',
     'ν': 'v', 'α': 'a', 'ε': 'e', 'ι': 'i', 'ο': 'o',
 }
+_HOMOGLYPHS = re.compile('[' + re.escape(''.join(HOMOGLYPH_MAP)) + ']')
+
+# ── Hard caps so adversarial inputs can't blow up decoding cost ──────────────
+MAX_B64_TOKENS = 256          # decodable Base64 tokens spliced into a prompt
+MAX_DECODED_CHARS = 65536     # total decoded Base64 text spliced into a prompt
+
+_B64_TOKEN = re.compile(r'[A-Za-z0-9+/]{20,}={0,2}')
+_PRINTABLE_ASCII = re.compile(r'[\x20-\x7e]+')
+_SMUGGLED = re.compile(r'\b([a-zA-Z])([ \.\-_]([a-zA-Z])){3,}\b')
+_SMUGGLE_SEPARATORS = str.maketrans('', '', ' .-_')
 
 
 def _normalize_homoglyphs(text: str) -> str:
     """Replace lookalike Unicode characters with ASCII equivalents."""
-    result = []
-    for ch in text:
-        result.append(HOMOGLYPH_MAP.get(ch, ch))
-    return ''.join(result)
+    # Pure-ASCII text (the common case) can't contain a homoglyph
+    if text.isascii():
+        return text
+    return _HOMOGLYPHS.sub(lambda m: HOMOGLYPH_MAP[m.group(0)], text)
 
 
 def _fix_token_smuggling(text: str) -> str:
@@ -37,38 +47,96 @@ def _fix_token_smuggling(text: str) -> str:
     """
     # Pattern: single chars separated by space/dot/dash/underscore
     # e.g. "I g n o r e  i n s t r u c t i o n s"
-    spaced = re.sub(r'\b([a-zA-Z])([ \.\-_]([a-zA-Z])){3,}\b',
-                    lambda m: m.group(0).replace(' ', '').replace('.', '').replace('-', '').replace('_', ''),
-                    text)
-    return spaced
+    return _SMUGGLED.sub(lambda m: m.group(0).translate(_SMUGGLE_SEPARATORS), text)
+
 
+def _decode_b64_token(token: str):
+    """Decoded text if the token is readable ASCII Base64, else None."""
+    try:
+        decoded = base64.b64decode(token + '==').decode('utf-8', errors='ignore')
+    except Exception:
+        return None
+    if len(decoded) > 5 and _PRINTABLE_ASCII.fullmatch(decoded):
+        return decoded
+    return None
 
-def _try_base64_decode(text: str) -> tuple[str, bool]:
+
+def _try_base64_decode(text: str) -> tuple[str, bool, bool]:
     """
     Try to detect and decode Base64 encoded payloads.
-    Returns (decoded_text, was_decoded).
+    Returns (decoded_text, was_decoded, truncated).
+
+    Decoded tokens are spliced in during a single scan. Output is identical to
+    replacing each decodable token everywhere in turn; the rare inputs where
+    that differs (a token also occurring inside a longer run or inside decoded
+    text) fall back to exactly that. At most MAX_B64_TOKENS decodable tokens and
+    MAX_DECODED_CHARS of decoded text are spliced in. Candidates that don't
+    decode (hashes, ids) don't count, so they can't hide a later payload;
+    truncated is True when a cap left a decodable token undecoded.
     """
-    # Look for Base64-like tokens (long alphanumeric+/= strings)
-    b64_pattern = re.compile(r'[A-Za-z0-9+/]{20,}={0,2}')
-    found = b64_pattern.findall(text)
-    decoded_any = False
-    result = text
-
-    for token in found:
-        try:
-            decoded = base64.b64decode(token + '==').decode('utf-8', errors='ignore')
-            # Only replace if decoded text looks like readable ASCII
-            if decoded and all(32 <= ord(c) < 127 for c in decoded) and len(decoded) > 5:
-                result = result.replace(token, f"{decoded}")
-                decoded_any = True
-        except Exception:
-            pass
-
-    return result, decoded_any
+    if len(text) < 20:
+        return text, False, False
+
+    hits = []
+    decoded_of = {}
+    budget = MAX_DECODED_CHARS
+    truncated = False
+    for m in _B64_TOKEN.finditer(text):
+        token = m.group(0)
+        if token not in decoded_of:
+            decoded = _decode_b64_token(token)
+            if decoded is not None:
+                if len(decoded) > budget:
+                    decoded, truncated = None, True
+                else:
+                    budget -= len(decoded)
+            decoded_of[token] = decoded
+        if decoded_of[token] is None:
+            continue
+        if len(hits) >= MAX_B64_TOKENS:
+            truncated = True
+            break
+        hits.append(m)
+
+    if not hits:
+        return text, False, truncated
+
+    if not _splice_is_exact(text, hits, decoded_of):
+        result = text
+        for m in hits:
+            result = result.replace(m.group(0), decoded_of[m.group(0)])
+        return result, True, truncated
+
+    parts = []
+    pos = 0
+    for m in hits:
+        parts.append(text[pos:m.start()])
+        parts.append(decoded_of[m.group(0)])
+        pos = m.end()
+    parts.append(text[pos:])
+    return ''.join(parts), True, truncated
+
+
+def _splice_is_exact(text: str, hits: list, decoded_of: dict) -> bool:
+    """True if splicing each match equals sequentially replacing every token occurrence."""
+    tokens = {m.group(0) for m in hits}
+    per_token = {}
+    for m in hits:
+        per_token[m.group(0)] = per_token.get(m.group(0), 0) + 1
+        # '=' right after a token could complete a later token across the splice
+        if text[m.end():m.end() + 1] == '=':
+            return False
+    decoded_blob = '\x00'.join(decoded_of[t] for t in tokens)
+    for token in tokens:
+        if text.count(token) != per_token[token] or token in decoded_blob:
+            return False
+    return True
 
 
 def _try_url_decode(text: str) -> tuple[str, bool]:
     """Decode URL-encoded characters like %69gnore → ignore."""
+    if '%' not in text:
+        return text, False
     decoded = urllib.parse.unquote(text)
     changed = decoded != text
     return decoded, changed
@@ -82,7 +150,8 @@ def _normalize_unicode(text: str) -> str:
 class Preprocessor:
     """
     Runs all normalization steps on a prompt before detection.
-    Returns cleaned text + a list of transformations applied.
+    Returns cleaned text + a list of transformations applied, and whether
+    a decoding cap cut the scan short (scan_truncated).
     """
 
     def process(self, text: str) -> dict:
@@ -105,10 +174,13 @@ class Preprocessor:
             text = url_decoded
 
         # Step 4: Base64 decode
-        b64_decoded, b64_changed = _try_base64_decode(text)
+        b64_decoded, b64_changed, truncated = _try_base64_decode(text)
         if b64_changed:
             transformations.append("Base64-encoded payload detected and decoded")
             text = b64_decoded
+        if truncated:
+            transformations.append(f"Base64 decoding stopped at its cap ({MAX_B64_TOKENS} payloads / "
+                                   f"{MAX_DECODED_CHARS} chars); later payloads were not decoded")
 
         # Step 5: Token smuggling fix
         fixed = _fix_token_smuggling(text)
@@ -120,7 +192,9 @@ class Preprocessor:
             "original": original,
             "cleaned": text,
             "transformations": transformations,
-            "was_modified": len(transformations) > 0
+            "was_modified": len(transformations) > 0,
+            # Part of the prompt may hide an undecoded payload; the detector won't ALLOW it
+            "scan_truncated": truncated,
         }
 
 
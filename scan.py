@@ -0,0 +1,253 @@
+"""
+scan.py — Bulk offline scanner for JSONL/CSV prompt corpora
+
+Streams the input file row by row (never loading it into memory), scores rows
+in batches — across a pre-fork worker pool when --workers > 1 — and appends one
+JSON line per row to the output. After every batch a checkpoint records the
+input byte offset and output size, so an interrupted run continues where it
+stopped with --resume.
+
+Usage:
+    python scan.py prompts.jsonl results.jsonl [--text-field text] [--id-field id]
+    python scan.py logs.csv results.jsonl --workers 4 --batch-size 512 --resume
+
+Output rows:
+    {"row": 0, "id": ..., "verdict": "BLOCK", "risk_score": 0.61,
+     "phase1": 0.9, "phase2": 0.72, "phase3": 0.48, "matches": [...], "top_match": {...}}
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+
+# ─────────────────────────────────────────────
+# Streaming readers
+# ─────────────────────────────────────────────
+class _ByteCountingLines:
+    """Decoded lines of a binary file, tracking the byte offset of what was consumed."""
+
+    def __init__(self, f, offset: int):
+        self.f = f
+        self.offset = offset
+
+    def __iter__(self):
+        for raw in self.f:
+            self.offset += len(raw)
+            yield raw.decode("utf-8", errors="replace")
+
+
+def _read_jsonl(f, offset: int, text_field: str, id_field: str):
+    lines = _ByteCountingLines(f, offset)
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield None, None, lines.offset
+            continue
+        if not isinstance(record, dict):
+            yield None, None, lines.offset
+            continue
+        yield record.get(text_field), record.get(id_field) if id_field else None, lines.offset
+
+
+def _read_csv(f, offset: int, text_field: str, id_field: str):
+    header = next(csv.reader(_ByteCountingLines(f, 0)))
+    if text_field not in header:
+        raise SystemExit(f"[Scan] CSV has no '{text_field}' column (columns: {', '.join(header)})")
+    text_col = header.index(text_field)
+    id_col = header.index(id_field) if id_field in header else None
+    if offset:
+        f.seek(offset)
+    else:
+        offset = f.tell()
+
+    # csv.reader pulls only the lines a record needs, so the offset stays exact
+    # even for quoted fields that span several lines
+    lines = _ByteCountingLines(f, offset)
+    for row in csv.reader(lines):
+        if not row:
+            continue
+        text = row[text_col] if text_col < len(row) else None
+        row_id = row[id_col] if id_col is not None and id_col < len(row) else None
+        yield text, row_id, lines.offset
+
+
+def read_rows(path: str, fmt: str, offset: int, text_field: str, id_field: str):
+    """Yield (text, id, byte_offset_after_row) starting at a byte offset."""
+    with open(path, "rb") as f:
+        if fmt == "csv":
+            yield from _read_csv(f, offset, text_field, id_field)
+        else:
+            f.seek(offset)
+            yield from _read_jsonl(f, offset, text_field, id_field)
+
+
+def _batches(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ─────────────────────────────────────────────
+# Checkpoint
+# ─────────────────────────────────────────────
+def load_checkpoint(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(path: str, state: dict) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+# ─────────────────────────────────────────────
+# Scanning
+# ─────────────────────────────────────────────
+def _output_row(row: int, row_id, result: dict) -> dict:
+    return {
+        "row": row,
+        "id": row_id,
+        "verdict": result["verdict"],
+        "risk_score": result["risk_score"],
+        "phase1": result["phase1"]["score"],
+        "phase2": result["phase2"]["score"],
+        "phase3": result["phase3"]["score"],
+        "matches": result["phase1"]["matches"],
+        "top_match": result["phase2"].get("top_match"),
+    }
+
+
+def _format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def scan(input_path: str, output_path: str, fmt: str = None, text_field: str = "text",
+         id_field: str = None, batch_size: int = 256, workers: int = 1, resume: bool = False,
+         checkpoint_path: str = None, progress_every: float = 5.0, guardian_kwargs: dict = None) -> dict:
+    fmt = fmt or ("csv" if input_path.lower().endswith(".csv") else "jsonl")
+    checkpoint_path = checkpoint_path or output_path + CHECKPOINT_SUFFIX
+    input_size = os.path.getsize(input_path)
+
+    state = {"input": os.path.abspath(input_path), "input_size": input_size,
+             "input_offset": 0, "rows": 0, "output_bytes": 0, "done": False}
+    if resume:
+        saved = load_checkpoint(checkpoint_path)
+        if saved is None:
+            print(f"[Scan] No checkpoint at {checkpoint_path}, starting from the beginning.")
+        elif saved.get("input") != state["input"] or saved.get("input_offset", 0) > input_size:
+            raise SystemExit(f"[Scan] Checkpoint {checkpoint_path} belongs to a different input.")
+        else:
+            state.update(saved, input_size=input_size)
+            if state["done"]:
+                print(f"[Scan] {input_path} already fully scanned ({state['rows']:,} rows).")
+                return state
+            print(f"[Scan] Resuming at row {state['rows']:,} (byte {state['input_offset']:,}).")
+
+    # Drop anything written after the last checkpoint (a batch that never finished)
+    with open(output_path, "ab") as out:
+        out.truncate(state["output_bytes"])
+
+    from detector import LLMGuardian
+    guardian = LLMGuardian(**(guardian_kwargs or {}))
+    pool = None
+    if workers > 1:
+        from worker_pool import GuardianPool
+        pool = GuardianPool(guardian, workers=workers)
+    analyze_batch = pool.analyze_batch if pool else guardian.analyze_batch
+
+    start = time.perf_counter()
+    start_rows, start_offset = state["rows"], state["input_offset"]
+    last_report = start
+    try:
+        with open(output_path, "ab") as out:
+            rows = read_rows(input_path, fmt, state["input_offset"], text_field, id_field)
+            for batch in _batches(rows, batch_size):
+                texts = [text for text, _, _ in batch if isinstance(text, str) and text.strip()]
+                results = iter(analyze_batch(texts)) if texts else iter(())
+                lines = []
+                for i, (text, row_id, _) in enumerate(batch):
+                    row = state["rows"] + i
+                    if isinstance(text, str) and text.strip():
+                        record = _output_row(row, row_id, next(results))
+                    else:
+                        record = {"row": row, "id": row_id, "error": f"no '{text_field}' text in row"}
+                    lines.append(json.dumps(record, ensure_ascii=False))
+                out.write(("\n".join(lines) + "\n").encode("utf-8"))
+                out.flush()
+
+                state["rows"] += len(batch)
+                state["input_offset"] = batch[-1][2]
+                state["output_bytes"] = out.tell()
+                save_checkpoint(checkpoint_path, state)
+
+                now = time.perf_counter()
+                if now - last_report >= progress_every:
+                    last_report = now
+                    _report_progress(state, start_rows, start_offset, now - start)
+    finally:
+        if pool:
+            pool.close()
+
+    state["done"] = True
+    save_checkpoint(checkpoint_path, state)
+    _report_progress(state, start_rows, start_offset, time.perf_counter() - start)
+    print(f"[Scan] Done: {state['rows']:,} rows → {output_path}")
+    return state
+
+
+def _report_progress(state: dict, start_rows: int, start_offset: int, elapsed: float) -> None:
+    rows_per_s = (state["rows"] - start_rows) / elapsed if elapsed > 0 else 0.0
+    bytes_per_s = (state["input_offset"] - start_offset) / elapsed if elapsed > 0 else 0.0
+    remaining = state["input_size"] - state["input_offset"]
+    eta = _format_eta(remaining / bytes_per_s) if bytes_per_s > 0 else "?"
+    percent = 100 * state["input_offset"] / state["input_size"] if state["input_size"] else 100.0
+    print(f"[Scan] {state['rows']:,} rows  {percent:5.1f}%  {rows_per_s:,.0f} rows/s  ETA {eta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a JSONL/CSV prompt corpus with LLM Guardian")
+    parser.add_argument("input", help="JSONL or CSV file")
+    parser.add_argument("output", help="JSONL results file (appended to, truncated to the checkpoint on resume)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None, help="default: from the file extension")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default=None, help="field/column copied to each output row")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=1, help="forked worker processes (1 = in-process)")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint")
+    parser.add_argument("--checkpoint", default=None, help=f"default: OUTPUT{CHECKPOINT_SUFFIX}")
+    parser.add_argument("--progress-every", type=float, default=5.0, help="seconds between progress lines")
+    parser.add_argument("--cascade", action="store_true", help="skip phases that cannot change the verdict")
+    parser.add_argument("--long-prompt-mode", action="store_true")
+    args = parser.parse_args()
+
+    if not args.resume and os.path.exists(args.output) and os.path.getsize(args.output):
+        sys.exit(f"[Scan] {args.output} already exists; pass --resume or choose another output.")
+
+    scan(args.input, args.output, fmt=args.format, text_field=args.text_field, id_field=args.id_field,
+         batch_size=args.batch_size, workers=args.workers, resume=args.resume,
+         checkpoint_path=args.checkpoint, progress_every=args.progress_every,
+         guardian_kwargs={"cascade": args.cascade, "long_prompt_mode": args.long_prompt_mode})
+
+
+if __name__ == "__main__":
+    main()
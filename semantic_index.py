@@ -0,0 +1,387 @@
+"""
+semantic_index.py — Nearest-neighbour backends for Phase 2
+
+Every backend stores (id, document, embedding) triples, answers top-1
+cosine-distance queries for a batch of query embeddings, can remove
+entries by id and returns the stored embeddings of given ids.
+
+  numpy  → exact search: normalized float32 matrix, one matmul + argmax (default)
+  chroma → ChromaDB EphemeralClient HNSW collection
+  int8   → int8 codes (388 B/fingerprint resident) + float re-rank of the top candidates
+  binary → sign-bit codes (48 B/fingerprint resident) + float re-rank of the top candidates
+
+The quantized backends keep codes, float vectors and document text in
+memory-mapped files; only the codes are scanned on every search, the float
+rows and texts of the few re-ranked candidates are paged in on demand.
+"""
+
+import os
+import shutil
+import tempfile
+import uuid
+import weakref
+import numpy as np
+
+COLLECTION_NAME = "jailbreak_signatures"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class NumpyIndex:
+    """Exact cosine search over an in-process float32 matrix."""
+
+    name = "numpy"
+
+    def __init__(self):
+        self.ids = []
+        self.documents = []
+        self.matrix = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, ids: list, documents: list, embeddings) -> None:
+        if not ids:
+            return
+        block = _normalize(embeddings)
+        self.matrix = block if self.matrix is None else np.vstack([self.matrix, block])
+        self.ids.extend(ids)
+        self.documents.extend(documents)
+
+    def remove(self, ids: list) -> int:
+        """Drop entries by id; returns the number removed."""
+        drop = set(ids)
+        keep = [i for i, id_ in enumerate(self.ids) if id_ not in drop]
+        removed = len(self.ids) - len(keep)
+        if removed:
+            self.ids = [self.ids[i] for i in keep]
+            self.documents = [self.documents[i] for i in keep]
+            self.matrix = self.matrix[keep] if keep else None
+        return removed
+
+    def embeddings(self, ids: list) -> dict:
+        """id → stored (normalized) embedding, for the ids present."""
+        rows = {id_: i for i, id_ in enumerate(self.ids)}
+        return {id_: self.matrix[rows[id_]].copy() for id_ in ids if id_ in rows}
+
+    def search(self, embeddings) -> list:
+        """Return one (distance, document) per query, or None if the index is empty."""
+        queries = _normalize(embeddings)
+        if self.matrix is None or len(queries) == 0:
+            return [None] * len(queries)
+        sims = queries @ self.matrix.T
+        best = sims.argmax(axis=1)
+        return [
+            (1.0 - float(sims[row, col]), self.documents[col])
+            for row, col in enumerate(best)
+        ]
+
+
+class ChromaIndex:
+    """HNSW search through a ChromaDB in-memory collection."""
+
+    name = "chroma"
+
+    def __init__(self):
+        import chromadb
+
+        # EphemeralClient = pure in-memory, no filesystem writes needed
+        # Works correctly with chromadb 0.5.x (Python SQLite backend)
+        self.client = chromadb.EphemeralClient()
+        # Ephemeral clients share one in-process system, so names must be unique
+        self.collection = self.client.create_collection(
+            name=f"{COLLECTION_NAME}_{uuid.uuid4().hex[:8]}",
+            embedding_function=None,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    def __len__(self):
+        return self.collection.count()
+
+    def add(self, ids: list, documents: list, embeddings) -> None:
+        if not ids:
+            return
+        self.collection.add(
+            ids=ids,
+            documents=documents,
+            embeddings=np.asarray(embeddings, dtype=np.float32).tolist()
+        )
+
+    def remove(self, ids: list) -> int:
+        present = self.collection.get(ids=list(ids), include=[])["ids"]
+        if present:
+            self.collection.delete(ids=present)
+        return len(present)
+
+    def embeddings(self, ids: list) -> dict:
+        """id → stored embedding, for the ids present."""
+        if not ids:
+            return {}
+        found = self.collection.get(ids=list(ids), include=["embeddings"])
+        return {id_: np.asarray(v, dtype=np.float32) for id_, v in zip(found["ids"], found["embeddings"])}
+
+    def search(self, embeddings) -> list:
+        queries = np.asarray(embeddings, dtype=np.float32)
+        if len(queries) == 0:
+            return []
+        results = self.collection.query(query_embeddings=queries.tolist(), n_results=1)
+        found = []
+        for i in range(len(queries)):
+            if results["distances"] and results["distances"][i]:
+                document = results["documents"][i][0] if results["documents"][i] else ""
+                found.append((results["distances"][i][0], document))
+            else:
+                found.append(None)
+        return found
+
+
+class _StringColumn:
+    """Append-only UTF-8 strings in a blob file plus an int64 end-offset file, both memory-mapped."""
+
+    def __init__(self, path: str, name: str):
+        self.blob_path = os.path.join(path, f"{name}.bin")
+        self.index_path = os.path.join(path, f"{name}.idx")
+        for f in (self.blob_path, self.index_path):
+            open(f, "wb").close()
+        self.size = 0
+        self.blob = self.ends = None
+
+    def append(self, values: list) -> None:
+        encoded = [str(v).encode("utf-8") for v in values]
+        base = int(self.ends[-1]) if self.size else 0
+        ends = base + np.cumsum([len(e) for e in encoded], dtype=np.int64)
+        with open(self.blob_path, "ab") as f:
+            f.write(b"".join(encoded))
+        with open(self.index_path, "ab") as f:
+            f.write(ends.tobytes())
+        self.size += len(values)
+        self.ends = np.memmap(self.index_path, dtype=np.int64, mode="r", shape=(self.size,))
+        self.blob = np.memmap(self.blob_path, dtype=np.uint8, mode="r") if ends[-1] else None
+
+    def __getitem__(self, i: int) -> str:
+        start = int(self.ends[i - 1]) if i else 0
+        end = int(self.ends[i])
+        return bytes(self.blob[start:end]).decode("utf-8") if end > start else ""
+
+    def tolist(self) -> list:
+        return [self[i] for i in range(self.size)]
+
+    def disk_bytes(self) -> int:
+        return os.path.getsize(self.blob_path) + os.path.getsize(self.index_path)
+
+
+class QuantizedIndex:
+    """
+    Base for compact on-disk indexes. Search scans the quantized codes in
+    chunks to pick `rerank` candidates per query, then re-scores those with
+    the exact float32 vectors and returns the best. The files are append-only;
+    removed rows are tombstoned in an in-memory mask and skipped by search.
+    """
+
+    name = None
+    CHUNK_ROWS = 65536
+    RERANK = 32
+
+    def __init__(self, path: str = None, rerank: int = None):
+        """
+        path   — directory for the memory-mapped files (default: a private temp dir,
+                 deleted with the index)
+        rerank — candidates per query re-scored with float vectors
+        """
+        if path is None:
+            path = tempfile.mkdtemp(prefix=f"guardian_{self.name}_")
+            weakref.finalize(self, shutil.rmtree, path, True)
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.rerank = rerank or self.RERANK
+        self.dim = None
+        self.count = 0
+        self.dead = np.zeros(0, dtype=bool)
+        self.codes = self.scales = self.vectors = None
+        self._codes_path = os.path.join(path, "codes.bin")
+        self._scales_path = os.path.join(path, "scales.f32")
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        for f in (self._codes_path, self._scales_path, self._vectors_path):
+            open(f, "wb").close()
+        self._ids = _StringColumn(path, "ids")
+        self._documents = _StringColumn(path, "documents")
+
+    def __len__(self):
+        return self.count - int(self.dead.sum())
+
+    @property
+    def ids(self) -> list:
+        return [self._ids[i] for i in np.flatnonzero(~self.dead)]
+
+    @property
+    def documents(self) -> list:
+        return [self._documents[i] for i in np.flatnonzero(~self.dead)]
+
+    # ── Subclass hooks ────────────────────────────────────────────────────────
+    def _encode(self, block: np.ndarray) -> tuple:
+        """(codes, per-row scales or None) for a block of normalized vectors."""
+        raise NotImplementedError
+
+    def _code_width(self) -> tuple:
+        """(dtype, bytes per row) of the codes."""
+        raise NotImplementedError
+
+    def _approx_scores(self, queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        """(queries × rows) similarity estimates for rows [start, end); higher is closer."""
+        raise NotImplementedError
+
+    # ── Storage ───────────────────────────────────────────────────────────────
+    def add(self, ids: list, documents: list, embeddings) -> None:
+        if not ids:
+            return
+        # Streamed in chunks so a memory-mapped float artifact is never fully loaded
+        for start in range(0, len(ids), self.CHUNK_ROWS):
+            block = _normalize(embeddings[start:start + self.CHUNK_ROWS])
+            if self.dim is None:
+                self.dim = block.shape[1]
+            codes, scales = self._encode(block)
+            with open(self._vectors_path, "ab") as f:
+                f.write(block.tobytes())
+            with open(self._codes_path, "ab") as f:
+                f.write(np.ascontiguousarray(codes).tobytes())
+            if scales is not None:
+                with open(self._scales_path, "ab") as f:
+                    f.write(scales.astype(np.float32).tobytes())
+        self._ids.append(ids)
+        self._documents.append(documents)
+        self.count += len(ids)
+        self.dead = np.concatenate([self.dead, np.zeros(len(ids), dtype=bool)])
+        self._map()
+
+    def remove(self, ids: list) -> int:
+        """Tombstone entries by id (a linear scan of the id column); returns the number removed."""
+        drop = set(ids)
+        rows = [i for i in np.flatnonzero(~self.dead) if self._ids[i] in drop]
+        dead = self.dead.copy()
+        dead[rows] = True
+        self.dead = dead
+        return len(rows)
+
+    def embeddings(self, ids: list) -> dict:
+        """id → stored (normalized) float vector, for the ids present; read from the memory-mapped file."""
+        wanted = set(ids)
+        rows = {}
+        for i in np.flatnonzero(~self.dead):
+            id_ = self._ids[i]
+            if id_ in wanted:
+                rows[id_] = i
+        return {id_: np.array(self.vectors[rows[id_]]) for id_ in ids if id_ in rows}
+
+    def _map(self):
+        dtype, width = self._code_width()
+        self.codes = np.memmap(self._codes_path, dtype=dtype, mode="r", shape=(self.count, width))
+        self.vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        if os.path.getsize(self._scales_path):
+            self.scales = np.memmap(self._scales_path, dtype=np.float32, mode="r", shape=(self.count,))
+
+    def resident_bytes(self) -> int:
+        """Bytes scanned on every search (codes + scales): the working set that must stay in RAM."""
+        return (self.codes.nbytes if self.codes is not None else 0) + \
+               (self.scales.nbytes if self.scales is not None else 0)
+
+    def disk_bytes(self) -> int:
+        return sum(os.path.getsize(f) for f in (self._codes_path, self._scales_path, self._vectors_path)) \
+               + self._ids.disk_bytes() + self._documents.disk_bytes()
+
+    # ── Search ────────────────────────────────────────────────────────────────
+    def _candidates(self, queries: np.ndarray, k: int) -> np.ndarray:
+        """Row indices of the k best approximate matches per query, merged chunk by chunk."""
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, self.count, self.CHUNK_ROWS):
+            end = min(start + self.CHUNK_ROWS, self.count)
+            chunk = self._approx_scores(queries, start, end)
+            chunk[:, self.dead[start:end]] = -np.inf
+            scores = np.hstack([best_scores, chunk])
+            rows = np.hstack([best_rows, np.broadcast_to(np.arange(start, end), (len(queries), end - start))])
+            if scores.shape[1] > k:
+                keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                rows = np.take_along_axis(rows, keep, axis=1)
+            best_scores, best_rows = scores, rows
+        return best_rows
+
+    def search(self, embeddings) -> list:
+        """Return one (distance, document) per query, or None if the index is empty."""
+        queries = _normalize(embeddings)
+        if not len(self) or len(queries) == 0:
+            return [None] * len(queries)
+        candidates = self._candidates(queries, min(self.rerank, self.count))
+        found = []
+        for query, rows in zip(queries, candidates):
+            rows = np.unique(rows)      # sorted: sequential page-ins, lowest index wins ties
+            rows = rows[~self.dead[rows]]
+            if not len(rows):
+                found.append(None)
+                continue
+            sims = self.vectors[rows] @ query
+            best = int(sims.argmax())
+            found.append((1.0 - float(sims[best]), self._documents[int(rows[best])]))
+        return found
+
+
+class Int8Index(QuantizedIndex):
+    """Per-row scaled int8 codes: score ≈ scale · (codes · query)."""
+
+    name = "int8"
+    RERANK = 16
+
+    def _encode(self, block: np.ndarray) -> tuple:
+        scales = np.abs(block).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(block / scales[:, None]).astype(np.int8), scales
+
+    def _code_width(self) -> tuple:
+        return np.int8, self.dim
+
+    def _approx_scores(self, queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        codes = np.asarray(self.codes[start:end], dtype=np.float32)
+        return (queries @ codes.T) * self.scales[start:end]
+
+
+class BinaryIndex(QuantizedIndex):
+    """
+    Sign-bit codes, 1 bit per dimension. Scored asymmetrically — float query
+    against the ±1 code — which ranks better than Hamming distance.
+    """
+
+    name = "binary"
+    RERANK = 64
+
+    def _encode(self, block: np.ndarray) -> tuple:
+        return np.packbits(block > 0, axis=1), None
+
+    def _code_width(self) -> tuple:
+        return np.uint8, (self.dim + 7) // 8
+
+    def _approx_scores(self, queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        bits = np.unpackbits(self.codes[start:end], axis=1, count=self.dim)
+        # q·(2b − 1) = 2·(q·b) − Σq; the Σq term is the same for every row
+        return queries @ bits.T.astype(np.float32)
+
+
+INDEX_BACKENDS = {
+    NumpyIndex.name: NumpyIndex,
+    ChromaIndex.name: ChromaIndex,
+    Int8Index.name: Int8Index,
+    BinaryIndex.name: BinaryIndex,
+}
+
+
+def make_index(backend: str = "numpy"):
+    try:
+        return INDEX_BACKENDS[backend]()
+    except KeyError:
+        raise ValueError(f"Unknown index backend '{backend}'. Choose from: {', '.join(INDEX_BACKENDS)}") from None
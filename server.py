@@ -0,0 +1,302 @@
+"""
+server.py — Async HTTP scanning service for LLM Guardian
+
+Incoming /analyze requests are queued and grouped into micro-batches (up to
+--max-batch-size prompts, or whatever arrived within --max-wait-ms of the
+first one) so embedding and ML inference run through analyze_batch. A bounded
+queue provides backpressure (503 when full) and every request has a timeout
+(504). Standard library only.
+
+Usage:
+    python server.py [--host 0.0.0.0] [--port 8080] [--max-batch-size 32]
+                     [--max-wait-ms 5] [--queue-size 1024] [--timeout 10]
+                     [--verdict-cache-size 100000] [--startup eager|background]
+                     [--reload-interval 2]
+
+Endpoints:
+    POST /analyze   {"prompt": "..."}  → LLMGuardian result
+    GET  /health                       → status, queue depth, model versions, cache hit rates
+    GET  /ready                        → 200 once every phase is loaded, else 503 ("state":
+                                         "loading", or "failed" if a phase failed to load)
+    GET  /metrics                      → Prometheus text: stage latencies, verdicts, rule matches
+    POST /reload    {"force": false}   → hot-reload rules.json / attacks.txt if changed and
+                                         apply new fingerprints.log records
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+MAX_BODY_BYTES = 1 << 20
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error",
+    503: "Service Unavailable", 504: "Gateway Timeout",
+}
+
+
+class QueueFull(Exception):
+    pass
+
+
+# ─────────────────────────────────────────────
+# Micro-batcher
+# ─────────────────────────────────────────────
+class MicroBatcher:
+    def __init__(self, guardian, max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 queue_size: int = 1024):
+        self.guardian = guardian
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        # One inference thread: batches run back to back, the event loop stays free
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="guardian-batch")
+        self.batches = 0
+        self.prompts = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        self.executor.shutdown(wait=False)
+
+    def submit(self, prompt: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((prompt, future))
+        except asyncio.QueueFull:
+            raise QueueFull() from None
+        return future
+
+    async def _collect(self) -> list:
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Requests that already timed out don't need scoring
+            batch = [(prompt, future) for prompt, future in batch if not future.done()]
+            if not batch:
+                continue
+            prompts = [prompt for prompt, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.guardian.analyze_batch, prompts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.prompts += len(prompts)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "batches": self.batches,
+            "prompts": self.prompts,
+            "mean_batch_size": round(self.prompts / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+# ─────────────────────────────────────────────
+# HTTP layer
+# ─────────────────────────────────────────────
+class GuardianServer:
+    def __init__(self, guardian, batcher: MicroBatcher, timeout: float = 10.0):
+        self.guardian = guardian
+        self.batcher = batcher
+        self.timeout = timeout
+        self.started_at = time.time()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self._route(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as e:
+            self._write_response(writer, 400, {"error": str(e)}, keep_alive=False)
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, path, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise ValueError("malformed request line") from None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0) or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path.split("?", 1)[0], headers, body
+
+    async def _route(self, method: str, path: str, body: bytes) -> tuple:
+        if path == "/health":
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            return 200, self.health()
+        if path == "/ready":
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            readiness = self.guardian.readiness()
+            return (200 if readiness["ready"] else 503), readiness
+        if path == "/metrics":
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            return 200, metrics.prometheus_text()
+        if path == "/analyze":
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            return await self.analyze(body)
+        if path == "/reload":
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            return await self.reload(body)
+        return 404, {"error": f"no route for {path}"}
+
+    async def analyze(self, body: bytes) -> tuple:
+        try:
+            prompt = json.loads(body or b"{}").get("prompt")
+        except (ValueError, AttributeError):
+            return 400, {"error": "body must be a JSON object"}
+        if not isinstance(prompt, str) or not prompt.strip():
+            return 400, {"error": "'prompt' must be a non-empty string"}
+
+        try:
+            future = self.batcher.submit(prompt)
+        except QueueFull:
+            return 503, {"error": "queue full, retry later"}
+        try:
+            return 200, await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            return 504, {"error": f"analysis exceeded {self.timeout}s"}
+        except Exception as e:
+            return 500, {"error": repr(e)}
+
+    async def reload(self, body: bytes) -> tuple:
+        try:
+            force = bool(json.loads(body or b"{}").get("force", False))
+        except (ValueError, AttributeError):
+            return 400, {"error": "body must be a JSON object"}
+        # Rebuilding runs off the event loop; /analyze keeps serving the old engines meanwhile
+        report = await asyncio.get_running_loop().run_in_executor(None, self.guardian.reload, force)
+        rejected = any(status["state"] == "rejected" for status in report.values())
+        return (422 if rejected else 200), {"phases": report, "models": self.guardian.model_info()}
+
+    def health(self) -> dict:
+        readiness = self.guardian.readiness()
+        return {
+            # "starting": Phase 2/3 still loading, verdicts come from the loaded phases;
+            # "failed": a phase failed to load and is retried after a backoff or on POST /reload
+            "status": {"ready": "ok", "loading": "starting", "failed": "failed"}[readiness["state"]],
+            "readiness": readiness,
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "batcher": self.batcher.stats(),
+            "models": self.guardian.model_info(),
+            "cache": self.guardian.cache_stats(),
+            "reload": self.guardian.reload_status(),
+        }
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+        # str payloads are Prometheus text, everything else is JSON
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+        headers = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if status == 503:
+            headers.append("Retry-After: 1")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+
+
+async def serve(guardian, host: str = "0.0.0.0", port: int = 8080, max_batch_size: int = 32,
+                max_wait_ms: float = 5.0, queue_size: int = 1024, timeout: float = 10.0):
+    batcher = MicroBatcher(guardian, max_batch_size, max_wait_ms, queue_size)
+    batcher.start()
+    app = GuardianServer(guardian, batcher, timeout)
+    server = await asyncio.start_server(app.handle, host, port)
+    print(f"[Server] Listening on http://{host}:{port} "
+          f"(batch ≤ {max_batch_size}, wait ≤ {max_wait_ms} ms, queue {queue_size})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM Guardian HTTP scanning service")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--queue-size", type=int, default=1024)
+    parser.add_argument("--timeout", type=float, default=10.0, help="per-request timeout in seconds")
+    parser.add_argument("--verdict-cache-size", type=int, default=100_000,
+                        help="distinct prompts kept in the exact-match verdict cache (0 disables)")
+    parser.add_argument("--startup", choices=["eager", "background"], default="eager",
+                        help="background: listen immediately, answering from Phase 1 until Phase 2/3 load")
+    parser.add_argument("--reload-interval", type=float, default=None,
+                        help="poll rules.json/attacks.txt/fingerprints.log every N seconds and hot-reload changes")
+    args = parser.parse_args()
+
+    from detector import LLMGuardian
+    guardian = LLMGuardian(verdict_cache_size=args.verdict_cache_size, startup=args.startup,
+                           reload_interval=args.reload_interval)
+    try:
+        asyncio.run(serve(guardian, args.host, args.port, args.max_batch_size,
+                          args.max_wait_ms, args.queue_size, args.timeout))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Shared fixtures: models are trained in a scratch copy of the repo's data files."""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATA_FILES = ("jailbreak_data.csv", "rules.json", "attacks.txt")
+
+
+@pytest.fixture(scope="session")
+def workdir(tmp_path_factory):
+    """A working directory with the data files and an empty feedback store."""
+    path = tmp_path_factory.mktemp("guardian")
+    for name in DATA_FILES:
+        shutil.copy(os.path.join(ROOT, name), path)
+    previous = os.getcwd()
+    os.chdir(path)
+    yield path
+    from feedback_store import close_feedback_store
+    close_feedback_store()
+    os.chdir(previous)
+
+
+@pytest.fixture(scope="session")
+def phase3(workdir):
+    from detector import Phase3ML
+    return Phase3ML(store=None)
+
+
+@pytest.fixture(scope="session")
+def phase2(workdir):
+    """Phase 2 engine without a fingerprint log; skips if the MiniLM encoder can't be loaded."""
+    from phase2_semantic import Phase2Semantic
+    try:
+        return Phase2Semantic(store=None, log_path=None)
+    except Exception as e:
+        pytest.skip(f"Phase 2 encoder unavailable: {e}")
@@ -0,0 +1,19 @@
+"""LRUCache memory cap."""
+
+from cache import LRUCache
+
+
+def test_oversized_put_is_refused_and_drops_stale_value():
+    cache = LRUCache(maxsize=10, max_bytes=1000, sizeof=lambda obj: obj if isinstance(obj, int) else 0)
+    assert cache.put("key", 100) is True
+    assert cache.put("key", 5000) is False
+    assert cache.get("key") is None
+    assert cache.nbytes == 0
+
+
+def test_put_evicts_least_recent_to_fit():
+    cache = LRUCache(maxsize=10, max_bytes=1000, sizeof=lambda obj: obj if isinstance(obj, int) else 0)
+    cache.put("a", 600)
+    cache.put("b", 600)
+    assert cache.get("a") is None and cache.get("b") == 600
+    assert cache.evictions == 1
@@ -0,0 +1,41 @@
+"""rules.json is validated before it is compiled or cached, on every load path."""
+
+import json
+import os
+import shutil
+
+import pytest
+
+from artifacts import ArtifactStore
+from phase1_rules import Phase1Rules
+
+BAD_RULES = [
+    [],
+    [{"name": "a", "pattern": "ignore", "risk": 1.5}],
+    [{"name": "a", "pattern": "ignore", "risk": 0.5}, {"name": "a", "pattern": "bypass", "risk": 0.5}],
+    [{"name": "a", "pattern": 7, "risk": 0.5}],
+]
+
+
+@pytest.fixture
+def rules_dir(workdir, tmp_path, monkeypatch):
+    shutil.copy(os.path.join(workdir, "rules.json"), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize("rules", BAD_RULES)
+def test_invalid_rules_rejected_before_caching(rules_dir, rules):
+    with open("rules.json", "w", encoding="utf-8") as f:
+        json.dump(rules, f)
+    store = ArtifactStore(str(rules_dir / "artifacts"))
+    with pytest.raises(ValueError):
+        Phase1Rules(store=store)
+    assert Phase1Rules.ARTIFACT not in store.entries()
+
+
+def test_valid_rules_cached_and_reloaded(rules_dir):
+    store = ArtifactStore(str(rules_dir / "artifacts"))
+    built = Phase1Rules(store=store)
+    assert Phase1Rules.ARTIFACT in store.entries()
+    assert Phase1Rules(store=store).version == built.version
@@ -0,0 +1,148 @@
+"""
+worker_pool.py — Pre-fork multi-process LLM Guardian
+
+The parent builds one LLMGuardian, then forks N workers that inherit the
+loaded MiniLM weights, TF-IDF vocabulary and fingerprint matrix
+copy-on-write instead of loading their own copies. Prompts are split into
+chunks and scored with analyze_batch across the workers, sidestepping the
+GIL of a single interpreter. Linux/macOS only (requires fork).
+
+Forking a process with live threads can leave their locks held forever in
+the children, so the guardian is quiesced first (LLMGuardian.prepare_fork):
+background threads are stopped or joined, the feedback store is closed and
+torch is limited to one thread. A reload watcher runs in every worker
+instead. It is not restarted in the parent, because the pool may fork a
+replacement worker from the parent at any time.
+
+Usage:
+    from worker_pool import GuardianPool
+    pool = GuardianPool(LLMGuardian(), workers=4)
+    pool.analyze_batch(prompts)
+    pool.memory_report()
+"""
+
+import gc
+import multiprocessing
+import os
+
+# Set in the parent right before forking; workers inherit it
+_GUARDIAN = None
+
+
+def _init_worker(threads: int, pids, watch_interval: float):
+    # Each process gets its own small intra-op pool so N workers don't oversubscribe cores
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    pids.put(os.getpid())
+    # Threads don't survive fork; each worker runs its own reload watcher
+    if watch_interval:
+        _GUARDIAN.watch(watch_interval)
+
+
+def _analyze_chunk(prompts: list) -> list:
+    return _GUARDIAN.analyze_batch(prompts)
+
+
+def process_memory(pid: int = None) -> dict:
+    """
+    RSS plus PSS/shared memory of a process from /proc. PSS splits shared
+    pages between the processes mapping them, so it shows what a worker
+    really costs once copy-on-write sharing is accounted for.
+    """
+    pid = pid or os.getpid()
+    info = {"pid": pid}
+    fields = {"Rss": "rss_kb", "Pss": "pss_kb", "Shared_Clean": "shared_clean_kb",
+              "Shared_Dirty": "shared_dirty_kb", "Private_Clean": "private_clean_kb",
+              "Private_Dirty": "private_dirty_kb"}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in fields:
+                    info[fields[name]] = int(rest.split()[0])
+    except OSError:
+        try:
+            with open(f"/proc/{pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        info["rss_kb"] = int(line.split()[1])
+        except OSError:
+            pass
+    return info
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+class GuardianPool:
+    def __init__(self, guardian, workers: int = None, chunk_size: int = 16, threads_per_worker: int = 1):
+        """
+        workers            — number of forked processes (default: CPU count)
+        chunk_size         — prompts per task sent to a worker
+        threads_per_worker — torch intra-op threads in each worker
+        """
+        global _GUARDIAN
+        # Everything must be loaded before forking (or each worker loads its own copy),
+        # and no background thread may be running while we fork
+        watch_interval = guardian.prepare_fork()
+        _GUARDIAN = guardian
+        self.guardian = guardian
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+        # Move everything loaded so far out of the GC's reach: collections would
+        # otherwise write to object headers and un-share the pages in every worker
+        gc.collect()
+        gc.freeze()
+        context = multiprocessing.get_context("fork")
+        # Workers report their pids; the pool may replace a worker that dies
+        self._pid_queue = context.SimpleQueue()
+        self.pool = context.Pool(self.workers, initializer=_init_worker,
+                                 initargs=(threads_per_worker, self._pid_queue, watch_interval))
+        self._pids = [self._pid_queue.get() for _ in range(self.workers)]
+        print(f"[Pool] Forked {self.workers} workers sharing one LLMGuardian.")
+
+    def analyze(self, prompt: str) -> dict:
+        return self.pool.apply(_analyze_chunk, ([prompt],))[0]
+
+    def analyze_batch(self, prompts: list) -> list:
+        chunks = [prompts[i:i + self.chunk_size] for i in range(0, len(prompts), self.chunk_size)]
+        results = []
+        for chunk in self.pool.imap(_analyze_chunk, chunks):
+            results.extend(chunk)
+        return results
+
+    def worker_pids(self) -> list:
+        """Pids of the live workers."""
+        while not self._pid_queue.empty():
+            self._pids.append(self._pid_queue.get())
+        self._pids = [pid for pid in self._pids if _alive(pid)]
+        return list(self._pids)
+
+    def memory_report(self) -> dict:
+        workers = [process_memory(pid) for pid in self.worker_pids()]
+        return {
+            "parent": process_memory(),
+            "workers": workers,
+            "total_rss_kb": sum(w.get("rss_kb", 0) for w in workers),
+            "total_pss_kb": sum(w.get("pss_kb", 0) for w in workers),
+        }
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        gc.unfreeze()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()